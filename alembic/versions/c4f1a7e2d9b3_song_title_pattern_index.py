@@ -0,0 +1,33 @@
+"""song title pattern index
+
+Revision ID: c4f1a7e2d9b3
+Revises: 5e92c889830f
+Create Date: 2026-10-17 19:41:05.277310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f1a7e2d9b3'
+down_revision: Union[str, Sequence[str], None] = '5e92c889830f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PostgreSQL only: LIKE 'prefix%' needs text_pattern_ops under a non-C collation
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index(
+            'ix_songs_title_pattern', 'songs', ['title'], unique=False,
+            postgresql_ops={'title': 'text_pattern_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_songs_title_pattern', table_name='songs')
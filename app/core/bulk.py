@@ -0,0 +1,117 @@
+"""Helpers for ingesting many audio files in one request."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import mimetypes
+from pathlib import Path, PurePosixPath
+from typing import Awaitable, Callable, Collection, Iterable, TypeVar
+import zipfile
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.media import (
+    AudioContentMismatchError,
+    AudioMetadata,
+    IncomingAudioFile,
+    StoredAudio,
+    UploadTooLargeError,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_ARCHIVE_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+@dataclass(slots=True)
+class BulkEntry:
+    filename: str | None
+    stored: StoredAudio | None = None
+    reason: str | None = None
+    metadata: AudioMetadata | None = None
+
+
+async def gather_bounded(
+    func: Callable[[T], Awaitable[R]], items: Iterable[T], *, concurrency: int
+) -> list[R]:
+    """``asyncio.gather`` over ``items`` with at most ``concurrency`` calls in flight."""
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def _bounded(item: T) -> R:
+        async with semaphore:
+            return await func(item)
+
+    return list(await asyncio.gather(*(_bounded(item) for item in items)))
+
+
+def _store_archive_member(
+    archive_path: Path, member: str, media_root: Path, max_bytes: int | None
+) -> StoredAudio:
+    incoming = IncomingAudioFile(
+        media_root,
+        max_bytes=max_bytes,
+        content_type=mimetypes.guess_type(PurePosixPath(member).name)[0] or "",
+    )
+    try:
+        with zipfile.ZipFile(archive_path) as archive, archive.open(member) as source:
+            while chunk := source.read(_ARCHIVE_CHUNK_SIZE):
+                incoming.write(chunk)
+        return incoming.commit()
+    except BaseException:
+        incoming.discard()
+        raise
+
+
+async def store_archive_members(
+    archive_path: Path,
+    media_root: Path,
+    *,
+    max_bytes: int | None,
+    allowed_types: Collection[str],
+    max_members: int,
+    concurrency: int,
+) -> list[BulkEntry]:
+    """Unpack the audio files in a zip archive into content-addressed storage.
+
+    Members are decompressed concurrently, each into its own hashed temp file,
+    so the archive is never extracted to disk as a whole. Members that are
+    not audio, too large or beyond ``max_members`` are reported as rejected.
+    """
+
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = [info.filename for info in archive.infolist() if not info.is_dir()]
+    except zipfile.BadZipFile:
+        return [BulkEntry(archive_path.name, reason="Not a valid zip archive")]
+
+    entries: list[BulkEntry] = []
+    accepted: list[BulkEntry] = []
+    for member in members:
+        name = PurePosixPath(member).name
+        media_type, _ = mimetypes.guess_type(name)
+        if (media_type or "").lower() not in allowed_types:
+            entries.append(BulkEntry(name, reason="Unsupported audio content type"))
+        elif len(accepted) >= max_members:
+            entries.append(BulkEntry(name, reason=f"At most {max_members} file(s) may be uploaded"))
+        else:
+            entry = BulkEntry(member)
+            accepted.append(entry)
+            entries.append(entry)
+
+    async def _store(entry: BulkEntry) -> None:
+        member = entry.filename or ""
+        entry.filename = PurePosixPath(member).name
+        try:
+            entry.stored = await run_in_threadpool(
+                _store_archive_member, archive_path, member, media_root, max_bytes
+            )
+        except (UploadTooLargeError, AudioContentMismatchError) as exc:
+            entry.reason = str(exc)
+        except (zipfile.BadZipFile, OSError, RuntimeError, NotImplementedError) as exc:
+            entry.reason = f"Could not read archive member: {exc}"
+
+    await gather_bounded(_store, accepted, concurrency=concurrency)
+    return entries
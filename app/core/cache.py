@@ -0,0 +1,70 @@
+"""Small in-process caches with LRU eviction and per-entry expiry."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+from typing import Generic, Hashable, TypeVar
+
+from app.core.metrics import CACHE_EVICTIONS, CACHE_HITS, CACHE_MISSES
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """A size bounded LRU cache whose entries expire after a time to live.
+
+    ``None`` values are stored as negative entries with their own, usually
+    shorter, time to live so lookups of unknown keys can be answered from
+    memory as well.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int,
+        ttl: float,
+        negative_ttl: float | None = None,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._entries: OrderedDict[K, tuple[float, V | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> tuple[bool, V | None]:
+        """Return ``(hit, value)``; ``value`` is ``None`` for negative entries."""
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                CACHE_HITS.labels(cache=self.name).inc()
+                return True, value
+            del self._entries[key]
+        CACHE_MISSES.labels(cache=self.name).inc()
+        return False, None
+
+    def set(self, key: K, value: V | None) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            CACHE_EVICTIONS.labels(cache=self.name).inc()
+
+    def invalidate(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -20,6 +21,17 @@ class Settings(BaseSettings):
     MEDIA_ROOT: str = "media"
     MEDIA_URL: str = "/media"
     MAX_UPLOAD_MB: int = 20
+    INGEST_MODE: Literal["inline", "background"] = "inline"
+    INGEST_WORKERS: int = 2
+    INGEST_MAX_PENDING: int = 100
+    BULK_CREATE_BATCH_SIZE: int = 500
+    BULK_CREATE_MAX_SONGS: int = 100_000
+    BULK_CREATE_MAX_MB: int = 64
+    BULK_UPLOAD_MAX_FILES: int = 500
+    BULK_UPLOAD_MAX_MB: int = 1024
+    BULK_UPLOAD_CONCURRENCY: int = 4
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 60 * 60
+    UPLOAD_SESSION_GC_INTERVAL_SECONDS: int = 15 * 60
     ALLOWED_AUDIO_MIME_TYPES: tuple[str, ...] = (
         "audio/mpeg",
         "audio/mp3",
@@ -28,6 +40,38 @@ class Settings(BaseSettings):
         "audio/flac",
         "audio/ogg",
     )
+    STREAM_CHUNK_KB: int = 1024
+    STREAM_ZERO_COPY: bool = True
+    # every play revalidates, so a 304 still reaches the server (but is not counted)
+    STREAM_CACHE_CONTROL: str = "private, no-cache"
+    MEDIA_IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+    MEDIA_CACHE_CONTROL: str = "public, no-cache"
+    MEDIA_CACHE_MB: int = 0
+    MEDIA_CACHE_MAX_FILE_MB: int = 64
+    MEDIA_CACHE_MIN_HITS: int = 2
+    LIST_DEFAULT_LIMIT: int = 50
+    LIST_MAX_LIMIT: int = 500
+    STATS_BATCH_MAX_IDS: int = 1000
+    SONG_CACHE_MAX_ENTRIES: int = 10000
+    SONG_CACHE_TTL_SECONDS: float = 300.0
+    SONG_CACHE_NEGATIVE_TTL_SECONDS: float = 5.0
+    CATALOGUE_CACHE_MAX_PAGES: int = 256
+    CATALOGUE_CACHE_TTL_SECONDS: float = 3600.0
+    CATALOGUE_VERSION_POLL_SECONDS: float = 1.0
+    PLAYCOUNT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    PLAYCOUNT_FLUSH_MAX_PENDING: int = 1000
+    PLAYCOUNT_UPSERT_BATCH_SIZE: int = 1000
+    PLAYCOUNT_MAX_PENDING_SONGS: int = 100_000
+    PLAY_DEDUP_WINDOW_SECONDS: float = 30.0
+    PLAY_DEDUP_MAX_ENTRIES: int = 100_000
+    PLAY_DEDUP_CLIENT_HEADER: str = "X-Client-Id"
+    PLAY_HISTORY_HOURLY_RETENTION_HOURS: int = 48
+    PLAY_HISTORY_DAILY_RETENTION_DAYS: int = 90
+    PLAY_HISTORY_COMPACTION_INTERVAL_SECONDS: int = 60 * 60
+    TRENDING_DEFAULT_LIMIT: int = 10
+    TRENDING_MAX_LIMIT: int = 100
+    STREAM_METRICS_MODE: Literal["topk", "all", "off"] = "topk"
+    STREAM_METRICS_TOP_K: int = 100
     DATABASE_URL_OVERRIDE: str | None = None
     API_KEY: str = "change"
 
@@ -60,5 +104,30 @@ class Settings(BaseSettings):
     def max_upload_bytes(self) -> int:
         return max(self.MAX_UPLOAD_MB, 1) * 1024 * 1024
 
+    @computed_field(return_type=int)
+    @property
+    def bulk_create_max_bytes(self) -> int:
+        return max(self.BULK_CREATE_MAX_MB, 1) * 1024 * 1024
+
+    @computed_field(return_type=int)
+    @property
+    def bulk_upload_max_bytes(self) -> int:
+        return max(self.BULK_UPLOAD_MAX_MB, 1) * 1024 * 1024
+
+    @computed_field(return_type=int)
+    @property
+    def media_cache_bytes(self) -> int:
+        return max(self.MEDIA_CACHE_MB, 0) * 1024 * 1024
+
+    @computed_field(return_type=int)
+    @property
+    def media_cache_max_file_bytes(self) -> int:
+        return max(self.MEDIA_CACHE_MAX_FILE_MB, 1) * 1024 * 1024
+
+    @computed_field(return_type=int)
+    @property
+    def stream_chunk_bytes(self) -> int:
+        return max(self.STREAM_CHUNK_KB, 1) * 1024
+
 
 settings = Settings()
@@ -1,8 +1,10 @@
 # reffered to https://praciano.com.br/fastapi-and-async-sqlalchemy-20-with-pytest-done-right.html for this
 
 import contextlib
+import re
 from typing import Any, AsyncIterator
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
@@ -78,6 +80,34 @@ class DatabaseSessionManager:
 sessionmanager = DatabaseSessionManager()
 
 
+def dialect_insert(session: AsyncSession):
+    """Return the dialect specific ``insert`` construct supporting ``ON CONFLICT``."""
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise DatabaseException(f"Upserts are not supported on {dialect}")
+
+
+def prefix_match(session: AsyncSession, column, prefix: str):
+    """A case-sensitive ``column`` starts-with ``prefix`` test that can seek an index.
+
+    PostgreSQL's ``LIKE`` is case-sensitive and served by a ``text_pattern_ops``
+    index. SQLite's ``LIKE`` folds ASCII case and never seeks, so ``GLOB``
+    (case-sensitive, and a range seek on a ``BINARY`` index) is used there.
+    The prefix is a single bound pattern, so the planner sees a constant.
+    """
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        escaped = re.sub(r"([*?\[])", r"[\1]", prefix)
+        return column.op("GLOB")(f"{escaped}*")
+    escaped = prefix.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return column.like(f"{escaped}%", escape="/")
+
+
 async def get_db():
     async with sessionmanager.session() as session:
         yield session
@@ -0,0 +1,148 @@
+"""Background metadata extraction on a bounded process pool."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+from pathlib import Path
+import time
+from typing import AsyncContextManager, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import sessionmanager
+from app.core.media import AudioMetadata, extract_audio_metadata, media_path_for_url
+from app.core.metrics import INGEST_EXTRACTION_LATENCY, INGEST_JOBS, INGEST_QUEUE_DEPTH
+from app.models.song import Song, SongStatus
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], AsyncContextManager[AsyncSession]]
+
+
+def _worker_context() -> multiprocessing.context.BaseContext:
+    # forking a threaded, event-loop-running server can deadlock the child on
+    # a lock some other thread held; start workers from a clean process instead
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class IngestPipeline:
+    """Extract audio metadata off the request path and fill in pending songs.
+
+    Tag parsing runs in a ``ProcessPoolExecutor`` so it neither blocks the
+    event loop nor competes with request handling for the GIL. Workers are
+    started with ``forkserver`` (``spawn`` where that is unavailable), never
+    forked from the running server. At most ``max_pending`` background jobs
+    are accepted at a time.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int,
+        max_pending: int,
+        session_factory: SessionFactory | None = None,
+    ):
+        self.workers = max(workers, 1)
+        self.max_pending = max(max_pending, 1)
+        self._session_factory: SessionFactory = session_factory or sessionmanager.session
+        self._executor: ProcessPoolExecutor | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._tasks)
+
+    def has_capacity(self) -> bool:
+        return len(self._tasks) < self.max_pending
+
+    async def extract(self, file_path: Path, audio_format: str | None = None) -> AudioMetadata:
+        """Run ``extract_audio_metadata`` in the process pool."""
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=_worker_context()
+            )
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(
+                self._executor, extract_audio_metadata, file_path, audio_format
+            )
+        finally:
+            INGEST_EXTRACTION_LATENCY.observe(time.perf_counter() - start)
+
+    def submit(self, song_id: str, file_path: Path, *, description: str | None) -> None:
+        """Queue metadata extraction for a song created in the pending state."""
+
+        task = asyncio.create_task(self._process(song_id, file_path, description))
+        self._tasks.add(task)
+        INGEST_QUEUE_DEPTH.set(len(self._tasks))
+        task.add_done_callback(self._forget)
+
+    def _forget(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        INGEST_QUEUE_DEPTH.set(len(self._tasks))
+
+    async def _process(self, song_id: str, file_path: Path, description: str | None) -> None:
+        try:
+            metadata = await self.extract(file_path)
+            status = SongStatus.READY
+        except Exception:
+            logger.exception("Metadata extraction failed for %s", file_path)
+            metadata, status = AudioMetadata(), SongStatus.FAILED
+
+        try:
+            async with self._session_factory() as session:
+                await Song.apply_metadata(
+                    session,
+                    song_id,
+                    title=metadata.title,
+                    description=description or metadata.description,
+                    duration=metadata.duration_seconds,
+                    status=status,
+                    media_info=metadata.media_info(),
+                )
+        except Exception:
+            INGEST_JOBS.labels(outcome="error").inc()
+            logger.exception("Failed to store extracted metadata for song %s", song_id)
+            return
+        INGEST_JOBS.labels(outcome=status.value).inc()
+
+    async def resume_pending(self) -> int:
+        """Requeue songs left pending by a previous process."""
+
+        async with self._session_factory() as session:
+            pending = await Song.list_pending(session)
+        for song in pending:
+            try:
+                file_path = media_path_for_url(
+                    song.audio_url, settings.media_path, settings.media_url_path
+                )
+            except ValueError:
+                continue
+            self.submit(song.id, file_path, description=None)
+        return len(pending)
+
+    async def join(self) -> None:
+        """Wait until every queued job has finished."""
+
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+ingest_pipeline = IngestPipeline(
+    workers=settings.INGEST_WORKERS,
+    max_pending=settings.INGEST_MAX_PENDING,
+)
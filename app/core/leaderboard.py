@@ -0,0 +1,95 @@
+"""Bounded per-song stream metrics."""
+
+from __future__ import annotations
+
+from typing import AsyncContextManager, Callable, Iterator
+
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import sessionmanager
+from app.models.stats import PlayCount
+
+SessionFactory = Callable[[], AsyncContextManager[AsyncSession]]
+
+
+class StreamLeaderboard(Collector):
+    """Export persisted play counts for at most ``capacity`` songs.
+
+    Play count flushes report each song's new total. Totals only grow, so any
+    song that enters the top ``capacity`` must have been played since startup
+    and is seen by ``update``: keeping the largest totals seen, after seeding
+    from the database, gives the exact top list in bounded memory. The
+    ``mosic_streams_total`` series is rebuilt on every scrape, so renamed or
+    evicted songs do not leave stale series behind. A ``capacity`` of ``None``
+    exports every song and ``0`` disables the per-song series.
+    """
+
+    def __init__(self, capacity: int | None):
+        self.capacity = capacity
+        self._entries: dict[str, tuple[int, str]] = {}
+        self._floor = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, song_id: str, title: str, count: int) -> None:
+        """Record the persisted total ``count`` for ``song_id``."""
+
+        if self.capacity == 0:
+            return
+        full = self.capacity is not None and len(self._entries) >= self.capacity
+        if full and song_id not in self._entries and count <= self._floor:
+            return
+
+        self._entries[song_id] = (count, title)
+        if self.capacity is not None and len(self._entries) > self.capacity:
+            coldest = min(self._entries, key=lambda key: self._entries[key][0])
+            del self._entries[coldest]
+            self._floor = min(entry[0] for entry in self._entries.values())
+
+    def top(self) -> list[tuple[str, str, int]]:
+        """Return ``(song_id, title, count)`` for tracked songs, hottest first."""
+
+        ranked = sorted(self._entries.items(), key=lambda item: item[1][0], reverse=True)
+        return [(song_id, title, count) for song_id, (count, title) in ranked]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._floor = 0
+
+    async def seed(self, session_factory: SessionFactory | None = None) -> int:
+        """Rebuild the leaderboard from the database, e.g. after a restart."""
+
+        if self.capacity == 0:
+            return 0
+        async with (session_factory or sessionmanager.session)() as session:
+            rows = await PlayCount.top(session, limit=self.capacity)
+        self.clear()
+        for song_id, title, count in rows:
+            self.update(song_id, title, count)
+        return len(rows)
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        family = GaugeMetricFamily(
+            "mosic_streams_total",
+            "Persisted stream count for the most played clips",
+            labels=["song_id", "title"],
+        )
+        for song_id, title, count in self.top():
+            family.add_metric([song_id, title], count)
+        yield family
+
+
+def _capacity() -> int | None:
+    if settings.STREAM_METRICS_MODE == "all":
+        return None
+    if settings.STREAM_METRICS_MODE == "off":
+        return 0
+    return max(settings.STREAM_METRICS_TOP_K, 1)
+
+
+stream_leaderboard = StreamLeaderboard(_capacity())
+REGISTRY.register(stream_leaderboard)
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from pathlib import Path
+import hashlib
+import os
+from pathlib import Path, PurePosixPath
 from typing import Iterable
 from uuid import uuid4
 
-from fastapi import UploadFile
-from fastapi.concurrency import run_in_threadpool
 from mutagen._file import File
 from mutagen._util import MutagenError
+from mutagen.flac import FLAC
+from mutagen.mp3 import MP3
+from mutagen.mp4 import MP4
+from mutagen.oggflac import OggFLAC
+from mutagen.oggopus import OggOpus
+from mutagen.oggspeex import OggSpeex
+from mutagen.oggvorbis import OggVorbis
+from mutagen.wave import WAVE
 
 _CHUNK_SIZE = 1024 * 1024  # 1 MiB
+_INCOMING_DIR = ".incoming"
 
 
 class UploadTooLargeError(ValueError):
@@ -19,55 +28,303 @@ class UploadTooLargeError(ValueError):
     pass
 
 
+class AudioContentMismatchError(ValueError):
+    """Raised when a file's leading bytes do not match its declared audio type."""
+
+    pass
+
+
 @dataclass(slots=True)
 class AudioMetadata:
     title: str | None = None
     description: str | None = None
     duration_seconds: int | None = None
+    mime_type: str | None = None
+    codec: str | None = None
+    bitrate: int | None = None
+    sample_rate: int | None = None
+
+    def media_info(self) -> dict[str, str | int | None]:
+        """The stream format fields as stored on ``Song``."""
+
+        return {
+            "mime_type": self.mime_type,
+            "codec": self.codec,
+            "bitrate": self.bitrate,
+            "sample_rate": self.sample_rate,
+        }
+
+
+# mutagen's first listed MIME type is not always the registered one
+_MIME_BY_FORMAT = {
+    "MP3": "audio/mpeg",
+    "WAVE": "audio/wav",
+    "FLAC": "audio/flac",
+    "OggVorbis": "audio/ogg",
+    "OggOpus": "audio/ogg",
+    "OggFLAC": "audio/ogg",
+    "OggSpeex": "audio/ogg",
+    "MP4": "audio/mp4",
+}
+_CODEC_BY_FORMAT = {
+    "MP3": "mp3",
+    "WAVE": "pcm",
+    "FLAC": "flac",
+    "OggVorbis": "vorbis",
+    "OggOpus": "opus",
+    "OggFLAC": "flac",
+    "OggSpeex": "speex",
+}
+
+
+# enough leading bytes to tell every sniffed format apart ("RIFF" size "WAVE")
+SNIFF_BYTES = 12
+
+# the mutagen classes worth trying for each sniffed format
+_MUTAGEN_TYPES = {
+    "mp3": (MP3,),
+    "wav": (WAVE,),
+    "flac": (FLAC,),
+    "ogg": (OggVorbis, OggOpus, OggFLAC, OggSpeex),
+    "mp4": (MP4,),
+}
+_FORMAT_BY_MIME = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/mp4": "mp4",
+    "audio/x-m4a": "mp4",
+}
+# stored files are named after their sniffed format, never the client's filename
+_SUFFIX_BY_FORMAT = {
+    "mp3": ".mp3",
+    "wav": ".wav",
+    "flac": ".flac",
+    "ogg": ".ogg",
+    "mp4": ".m4a",
+}
+
+
+def sniff_audio_format(head: bytes) -> str | None:
+    """Identify an audio container from its first ``SNIFF_BYTES`` bytes."""
+
+    if head.startswith(b"ID3"):
+        return "mp3"
+    if head.startswith(b"fLaC"):
+        return "flac"
+    if head.startswith(b"OggS"):
+        return "ogg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "wav"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    # a bare MPEG audio frame: 11 sync bits, then a layer other than "reserved"
+    # (which also rules out AAC's ADTS header)
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0 and head[1] & 0x06:
+        return "mp3"
+    return None
+
+
+def audio_format_for_type(content_type: str) -> str | None:
+    """The sniffed format a declared MIME type must match, if it is a known one."""
+
+    return _FORMAT_BY_MIME.get(content_type.lower())
+
+
+@dataclass(slots=True)
+class StoredAudio:
+    path: Path
+    content_hash: str
+    size_bytes: int
+    created: bool = True
+    audio_format: str | None = None
+
+
+def content_addressed_path(media_root: Path, content_hash: str, suffix: str) -> Path:
+    """Return the sharded ``ab/cd/<hash><suffix>`` location of a media file."""
+
+    return media_root / content_hash[:2] / content_hash[2:4] / f"{content_hash}{suffix.lower()}"
+
 
+def media_path_for_url(audio_url: str, media_root: Path, url_prefix: str) -> Path:
+    """Map a stored ``audio_url`` back onto the file inside ``media_root``."""
 
-async def store_audio_file(
-    upload: UploadFile, media_root: Path, *, max_bytes: int | None = None
-) -> Path:
-    """Persist an uploaded audio file to disk and return its path."""
+    prefix = f"{url_prefix.rstrip('/')}/"
+    if audio_url.startswith(prefix):
+        relative = PurePosixPath(audio_url[len(prefix):])
+    else:
+        relative = PurePosixPath(PurePosixPath(audio_url).name)
+    if relative.is_absolute() or ".." in relative.parts:
+        raise ValueError(f"Audio URL {audio_url!r} escapes the media root")
+    return media_root.joinpath(*relative.parts)
 
-    media_root.mkdir(parents=True, exist_ok=True)
-    suffix = Path(upload.filename or "").suffix or ""
-    filename = f"{uuid4().hex}{suffix}"
-    destination = media_root / filename
 
-    await upload.seek(0)
+def media_url_for_path(file_path: Path, media_root: Path, url_prefix: str) -> str:
+    """Inverse of ``media_path_for_url`` for files stored under ``media_root``."""
 
-    def _copy_to_disk() -> None:
-        written = 0
-        with destination.open("wb") as buffer:
-            while True:
-                chunk = upload.file.read(_CHUNK_SIZE)
-                if not chunk:
-                    break
-                written += len(chunk)
-                if max_bytes is not None and written > max_bytes:
-                    raise UploadTooLargeError("Uploaded file exceeds allowed size")
-                buffer.write(chunk)
+    relative = file_path.relative_to(media_root).as_posix()
+    return f"{url_prefix.rstrip('/')}/{relative}"
 
+
+def _incoming_path(media_root: Path) -> Path:
+    incoming = media_root / _INCOMING_DIR
+    incoming.mkdir(parents=True, exist_ok=True)
+    return incoming / f"{uuid4().hex}.part"
+
+
+def hash_file(file_path: Path) -> tuple[str, int]:
+    """Return the SHA-256 hex digest and byte size of a file."""
+
+    digest = hashlib.sha256()
+    size = 0
+    with file_path.open("rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def commit_to_store(
+    temp_path: Path,
+    media_root: Path,
+    content_hash: str,
+    size: int,
+    audio_format: str | None = None,
+) -> StoredAudio:
+    """Move a fully written temp file to its content-addressed location.
+
+    The suffix comes from ``audio_format``, so the same bytes always map to
+    the same path whatever the client called the file. ``created`` is only
+    true for the one caller whose link put the file there; a concurrent
+    commit of the same body finds it present.
+    """
+
+    suffix = _SUFFIX_BY_FORMAT.get(audio_format or "", "")
+    destination = content_addressed_path(media_root, content_hash, suffix)
+    destination.parent.mkdir(parents=True, exist_ok=True)
     try:
-        await run_in_threadpool(_copy_to_disk)
-    except UploadTooLargeError:
-        destination.unlink(missing_ok=True)
-        raise
-    finally:
-        await upload.close()
+        # unlike a rename, a link fails when the name is taken
+        os.link(temp_path, destination)
+        created = True
+    except FileExistsError:
+        created = False
+    except OSError:
+        # filesystems without hard links
+        created = not destination.exists()
+        if created:
+            os.replace(temp_path, destination)
+    temp_path.unlink(missing_ok=True)
+    return StoredAudio(destination, content_hash, size, created=created, audio_format=audio_format)
+
+
+class IncomingAudioFile:
+    """A temp file in ``MEDIA_ROOT`` that hashes and size-checks bytes as written.
+
+    The file lives on the same filesystem as the media library, so ``commit``
+    only renames it into place.
+
+    With ``content_type`` the first bytes are held back until the format can
+    be sniffed; a body that is not audio, or not the declared kind of audio,
+    raises ``AudioContentMismatchError`` before anything reaches the disk.
+    """
+
+    def __init__(
+        self,
+        media_root: Path,
+        *,
+        max_bytes: int | None = None,
+        content_type: str | None = None,
+    ):
+        self.media_root = media_root
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.audio_format: str | None = None
+        self.temp_path = _incoming_path(media_root)
+        self._digest = hashlib.sha256()
+        self._buffer = self.temp_path.open("wb")
+        self._sniffing = content_type is not None
+        self._expected = audio_format_for_type(content_type or "")
+        self._head = b""
 
-    return destination
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLargeError("Uploaded file exceeds allowed size")
+        if self._sniffing:
+            self._head += chunk
+            if len(self._head) < SNIFF_BYTES:
+                return
+            chunk = self._release_head()
+        self._digest.update(chunk)
+        self._buffer.write(chunk)
 
+    def _release_head(self) -> bytes:
+        head, self._head = self._head, b""
+        self._sniffing = False
+        self.audio_format = check_audio_head(head, self._expected)
+        return head
 
-def extract_audio_metadata(file_path: Path) -> AudioMetadata:
-    """Read common metadata values from an audio file."""
+    def _flush_head(self) -> None:
+        # bodies shorter than SNIFF_BYTES are judged on what arrived
+        if self._sniffing:
+            head = self._release_head()
+            self._digest.update(head)
+            self._buffer.write(head)
+
+    def close(self) -> Path:
+        """Finish writing and keep the temp file where it is."""
+
+        self._flush_head()
+        self._buffer.close()
+        return self.temp_path
+
+    def commit(self) -> StoredAudio:
+        self._flush_head()
+        self._buffer.close()
+        return commit_to_store(
+            self.temp_path,
+            self.media_root,
+            self._digest.hexdigest(),
+            self.size,
+            self.audio_format,
+        )
+
+    def discard(self) -> None:
+        self._buffer.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+def check_audio_head(head: bytes, expected: str | None) -> str:
+    """Sniff ``head`` and return its format, or raise if it is not the ``expected`` audio."""
+
+    audio_format = sniff_audio_format(head)
+    if audio_format is None:
+        raise AudioContentMismatchError("File content is not a recognised audio format")
+    if expected is not None and audio_format != expected:
+        raise AudioContentMismatchError("File content does not match the declared audio type")
+    return audio_format
+
+
+def extract_audio_metadata(file_path: Path, audio_format: str | None = None) -> AudioMetadata:
+    """Read common metadata values from an audio file.
+
+    Only the mutagen parsers for ``audio_format`` (sniffed from the file when
+    not given) are tried; unrecognised files fall back to probing them all.
+    """
 
     metadata = AudioMetadata()
 
     try:
-        audio = File(file_path)
+        if audio_format is None:
+            with file_path.open("rb") as f:
+                audio_format = sniff_audio_format(f.read(SNIFF_BYTES))
+        audio = File(file_path, options=_MUTAGEN_TYPES.get(audio_format or ""))
     except (MutagenError, OSError):
         return metadata
 
@@ -79,6 +336,15 @@ def extract_audio_metadata(file_path: Path) -> AudioMetadata:
     if length:
         metadata.duration_seconds = int(round(length))
 
+    audio_format = type(audio).__name__
+    mimes = getattr(audio, "mime", None) or [None]
+    metadata.mime_type = _MIME_BY_FORMAT.get(audio_format, mimes[0])
+    metadata.codec = getattr(info, "codec", None) or _CODEC_BY_FORMAT.get(audio_format)
+    if audio_format == "MP3" and getattr(info, "layer", 3) != 3:
+        metadata.codec = f"mp{info.layer}"
+    metadata.bitrate = getattr(info, "bitrate", None) or None
+    metadata.sample_rate = getattr(info, "sample_rate", None) or None
+
     tags = getattr(audio, "tags", None)
     if tags and hasattr(tags, "get"):
         metadata.title = _first_tag_value(tags, ("TIT2", "title", "\xa9nam", "Title"))
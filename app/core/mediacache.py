@@ -0,0 +1,169 @@
+"""Memory-mapped cache of the most played media files."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import mmap
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.metrics import (
+    CACHE_EVICTIONS,
+    CACHE_HITS,
+    CACHE_MISSES,
+    MEDIA_CACHE_ENTRIES,
+    MEDIA_CACHE_RESIDENT_BYTES,
+)
+
+_CACHE_NAME = "media"
+
+
+@dataclass(slots=True)
+class _Entry:
+    version: object
+    view: memoryview
+    size: int
+
+
+class MediaCache:
+    """Keep the hottest files memory-mapped within a byte budget.
+
+    Every lookup counts as a play of that file. A file is mapped once it has
+    been played ``min_hits`` times. When the budget is full it only displaces
+    files that were played less often (LFU), so one-off plays of cold tracks
+    cannot flush the hot set. Play counts are halved every ``decay_every``
+    lookups so the cache follows shifts in popularity.
+
+    Evicted mappings are not closed explicitly: responses still sending
+    slices keep them alive and they are unmapped once the last view goes away.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int,
+        max_file_bytes: int,
+        min_hits: int = 2,
+        decay_every: int = 10_000,
+    ):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.min_hits = max(min_hits, 1)
+        self.decay_every = max(decay_every, 1)
+        self._entries: dict[str, _Entry] = {}
+        self._frequency: dict[str, int] = {}
+        self._lookups = 0
+        self._resident = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, file_path: Path, size: int, version: object) -> memoryview | None:
+        """Return a read-only view of ``file_path`` if it is (or becomes) cached.
+
+        ``version`` identifies the file's content (a content hash or stat
+        fields); a cached mapping of a different version is discarded.
+        """
+
+        if not self.enabled:
+            return None
+
+        key = str(file_path)
+        frequency = self._frequency.get(key, 0) + 1
+        self._frequency[key] = frequency
+        self._lookups += 1
+        if self._lookups >= self.decay_every:
+            self._decay()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            CACHE_HITS.labels(cache=_CACHE_NAME).inc()
+            return entry.view
+        if entry is not None:
+            self._drop(key)
+        CACHE_MISSES.labels(cache=_CACHE_NAME).inc()
+
+        if frequency < self.min_hits or not 0 < size <= min(self.max_file_bytes, self.max_bytes):
+            return None
+        if not self._make_room(size, frequency):
+            return None
+        try:
+            view = _map_file(file_path)
+        except (OSError, ValueError):
+            return None
+        if len(view) != size:
+            return None
+
+        self._entries[key] = _Entry(version, view, size)
+        self._resident += size
+        self._update_gauges()
+        return view
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._frequency.clear()
+        self._lookups = 0
+        self._resident = 0
+        self._update_gauges()
+
+    def _make_room(self, size: int, frequency: int) -> bool:
+        overflow = self._resident + size - self.max_bytes
+        if overflow <= 0:
+            return True
+
+        victims: list[str] = []
+        for key in sorted(self._entries, key=lambda k: self._frequency.get(k, 0)):
+            if self._frequency.get(key, 0) >= frequency:
+                break
+            victims.append(key)
+            overflow -= self._entries[key].size
+            if overflow <= 0:
+                break
+        if overflow > 0:
+            return False
+
+        for key in victims:
+            self._drop(key)
+            CACHE_EVICTIONS.labels(cache=_CACHE_NAME).inc()
+        return True
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._resident -= entry.size
+        self._update_gauges()
+
+    def _decay(self) -> None:
+        self._lookups = 0
+        self._frequency = {
+            key: count // 2
+            for key, count in self._frequency.items()
+            if count // 2 or key in self._entries
+        }
+
+    def _update_gauges(self) -> None:
+        MEDIA_CACHE_RESIDENT_BYTES.set(self._resident)
+        MEDIA_CACHE_ENTRIES.set(len(self._entries))
+
+
+def _map_file(file_path: Path) -> memoryview:
+    with open(file_path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_WILLNEED"):
+        # start paging the file in now rather than on the first request
+        mapping.madvise(mmap.MADV_WILLNEED)
+    return memoryview(mapping)
+
+
+media_cache = MediaCache(
+    max_bytes=settings.media_cache_bytes,
+    max_file_bytes=settings.media_cache_max_file_bytes,
+    min_hits=settings.MEDIA_CACHE_MIN_HITS,
+)
@@ -1,4 +1,9 @@
+from contextlib import contextmanager
+import time
+from typing import Iterator, Mapping
+
 from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 TOTAL_API_REQUESTS = Counter(
     "mosic_api_requests_total",
@@ -12,8 +17,207 @@ REQUEST_LATENCY = Histogram(
     ["method", "path"],
 )
 
-STREAMS_BY_CLIP = Gauge(
-    "mosic_streams_total",
-    "Persisted stream count per clip",
-    ["song_id", "title"],
+# per-song stream totals are exported by app.core.leaderboard.StreamLeaderboard
+
+PLAYS = Counter(
+    "mosic_plays",
+    "Plays recorded across all songs",
+)
+
+PLAYS_SUPPRESSED = Counter(
+    "mosic_plays_suppressed",
+    "Repeat plays of a song by the same listener dropped inside the dedup window",
+)
+
+PLAYS_PER_SONG_FLUSH = Histogram(
+    "mosic_playcount_song_plays_per_flush",
+    "Plays of a single song folded into one play count flush",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000),
+)
+
+PLAYCOUNT_PENDING = Gauge(
+    "mosic_playcount_pending",
+    "Plays buffered in memory and not yet flushed to the database",
+)
+
+PLAYCOUNT_FLUSH_LAG = Histogram(
+    "mosic_playcount_flush_lag_seconds",
+    "Age of the oldest buffered play when its batch was flushed",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+PLAYCOUNT_FLUSH_BATCH_SIZE = Histogram(
+    "mosic_playcount_flush_batch_size",
+    "Number of songs upserted per play count flush",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+
+PLAYCOUNT_FLUSH_FAILURES = Counter(
+    "mosic_playcount_flush_failures_total",
+    "Play count flushes that failed and were requeued",
+)
+
+PLAYCOUNT_DROPPED = Counter(
+    "mosic_playcount_dropped",
+    "Plays dropped because the buffer already held the maximum number of songs",
+)
+
+CACHE_HITS = Counter(
+    "mosic_cache_hits_total",
+    "In-process cache lookups answered from memory",
+    ["cache"],
+)
+
+CACHE_MISSES = Counter(
+    "mosic_cache_misses_total",
+    "In-process cache lookups that fell through to the backing store",
+    ["cache"],
+)
+
+CACHE_EVICTIONS = Counter(
+    "mosic_cache_evictions_total",
+    "Entries evicted from an in-process cache to respect its size bound",
+    ["cache"],
+)
+
+MEDIA_CACHE_RESIDENT_BYTES = Gauge(
+    "mosic_media_cache_resident_bytes",
+    "Bytes of media files currently memory-mapped by the hot track cache",
+)
+
+MEDIA_CACHE_ENTRIES = Gauge(
+    "mosic_media_cache_entries",
+    "Media files currently memory-mapped by the hot track cache",
+)
+
+INGEST_QUEUE_DEPTH = Gauge(
+    "mosic_ingest_queue_depth",
+    "Uploaded songs waiting for background metadata extraction",
+)
+
+INGEST_EXTRACTION_LATENCY = Histogram(
+    "mosic_ingest_extraction_seconds",
+    "Time spent extracting audio metadata in the process pool",
 )
+
+INGEST_JOBS = Counter(
+    "mosic_ingest_jobs_total",
+    "Background ingest jobs by outcome",
+    ["outcome"],
+)
+
+PIPELINE_STAGE_LATENCY = Histogram(
+    "mosic_pipeline_stage_seconds",
+    "Time spent in each stage of the stream and upload pipelines",
+    ["route", "stage", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+STREAM_RESPONSE_BYTES = Histogram(
+    "mosic_stream_response_bytes",
+    "Body bytes sent per audio stream response",
+    ["route", "outcome"],
+    buckets=(1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024**2, 4 * 1024**2, 16 * 1024**2, 64 * 1024**2),
+)
+
+STREAM_THROUGHPUT = Histogram(
+    "mosic_stream_throughput_bytes_per_second",
+    "Average send rate of an audio stream response",
+    ["route", "outcome"],
+    buckets=(64 * 1024, 256 * 1024, 1024**2, 4 * 1024**2, 16 * 1024**2, 64 * 1024**2, 256 * 1024**2),
+)
+
+
+def route_template(scope: Mapping) -> str:
+    """The path template of the matched route, falling back to the raw path."""
+
+    route = scope.get("route")
+    return route.path if route is not None else scope.get("path", "")
+
+
+class RequestMetricsMiddleware:
+    """Count requests and time them until the response starts.
+
+    Plain ASGI middleware: every message is passed through untouched, so
+    responses can use server extensions such as ``http.response.zerocopy``
+    that ``BaseHTTPMiddleware`` rejects.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        observed = False
+
+        def observe() -> None:
+            nonlocal observed
+            observed = True
+            TOTAL_API_REQUESTS.labels(method=scope["method"]).inc()
+            REQUEST_LATENCY.labels(method=scope["method"], path=route_template(scope)).observe(
+                time.perf_counter() - start
+            )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and not observed:
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not observed:
+                observe()
+
+
+@contextmanager
+def observe_stage(route: str, stage: str) -> Iterator[None]:
+    """Record the duration of a pipeline stage, labelled ``ok`` or ``error``."""
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        PIPELINE_STAGE_LATENCY.labels(route=route, stage=stage, outcome=outcome).observe(
+            time.perf_counter() - start
+        )
+
+
+class StreamObserver:
+    """Collects stage timings for one streamed response.
+
+    Time to first byte and completion are measured from construction, which
+    should happen as the handler starts, so they cover the whole request.
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.bytes_sent = 0
+        self._first_byte_seen = False
+
+    def stage(self, stage: str, seconds: float, outcome: str = "ok") -> None:
+        PIPELINE_STAGE_LATENCY.labels(route=self.route, stage=stage, outcome=outcome).observe(
+            seconds
+        )
+
+    def sent(self, size: int) -> None:
+        if size and not self._first_byte_seen:
+            self._first_byte_seen = True
+            self.stage("first_byte", time.perf_counter() - self.started)
+        self.bytes_sent += size
+
+    def finish(self, outcome: str) -> None:
+        elapsed = time.perf_counter() - self.started
+        self.stage("complete", elapsed, outcome)
+        STREAM_RESPONSE_BYTES.labels(route=self.route, outcome=outcome).observe(self.bytes_sent)
+        if self.bytes_sent and elapsed > 0:
+            STREAM_THROUGHPUT.labels(route=self.route, outcome=outcome).observe(
+                self.bytes_sent / elapsed
+            )
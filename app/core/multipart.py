@@ -0,0 +1,297 @@
+"""Streaming multipart parsing straight into the media store."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Collection
+
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.media import (
+    AudioContentMismatchError,
+    IncomingAudioFile,
+    StoredAudio,
+    UploadTooLargeError,
+)
+
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class MultipartError(ValueError):
+    """Raised when a multipart request body is malformed."""
+
+    pass
+
+
+class UnsupportedAudioTypeError(ValueError):
+    """Raised when an uploaded part declares a content type that is not allowed."""
+
+    pass
+
+
+@dataclass(slots=True)
+class ReceivedAudio:
+    field_name: str
+    filename: str | None
+    content_type: str
+    stored: StoredAudio
+
+
+@dataclass(slots=True)
+class ReceivedArchive:
+    field_name: str
+    filename: str | None
+    path: Path
+
+
+@dataclass(slots=True)
+class RejectedPart:
+    field_name: str
+    filename: str | None
+    reason: str
+
+
+@dataclass(slots=True)
+class MultipartAudioForm:
+    files: list[ReceivedAudio] = field(default_factory=list)
+    fields: dict[str, str] = field(default_factory=dict)
+    archives: list[ReceivedArchive] = field(default_factory=list)
+    rejected: list[RejectedPart] = field(default_factory=list)
+
+    def discard(self) -> None:
+        """Remove every file this form wrote, e.g. after a later failure."""
+
+        for received in self.files:
+            if received.stored.created:
+                received.stored.path.unlink(missing_ok=True)
+        for archive in self.archives:
+            archive.path.unlink(missing_ok=True)
+
+
+@dataclass(slots=True)
+class _Part:
+    headers: dict[bytes, bytes] = field(default_factory=dict)
+    name: str = ""
+    filename: str | None = None
+    content_type: str = ""
+    data: bytearray = field(default_factory=bytearray)
+    incoming: IncomingAudioFile | None = None
+    archive: bool = False
+    skipped: bool = False
+
+
+class _AudioFormParser:
+    def __init__(
+        self,
+        media_root: Path,
+        *,
+        max_bytes: int | None,
+        allowed_types: Collection[str],
+        max_files: int,
+        reject_invalid: bool,
+        archive_types: Collection[str],
+        max_archive_bytes: int | None,
+    ):
+        self.media_root = media_root
+        self.max_bytes = max_bytes
+        self.allowed_types = allowed_types
+        self.max_files = max_files
+        self.reject_invalid = reject_invalid
+        self.archive_types = archive_types
+        self.max_archive_bytes = max_archive_bytes
+        self.form = MultipartAudioForm()
+        self._part = _Part()
+        self._header_name = b""
+        self._header_value = b""
+        self._file_parts = 0
+        self._pending_writes: list[tuple[_Part, bytes]] = []
+        self._finished: list[_Part] = []
+        self._open: list[IncomingAudioFile] = []
+
+    def on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._part.headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        part = self._part
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise MultipartError('The Content-Disposition header field "name" must be provided')
+        part.name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" not in options:
+            return
+
+        part.filename = options[b"filename"].decode("utf-8", "replace")
+        part.content_type = part.headers.get(b"content-type", b"").decode("latin-1").lower()
+        self._file_parts += 1
+        if self._file_parts > self.max_files:
+            self._reject(part, MultipartError(f"At most {self.max_files} file(s) may be uploaded"))
+            return
+
+        if part.content_type in self.archive_types:
+            part.archive = True
+            max_bytes = self.max_archive_bytes
+        elif part.content_type in self.allowed_types:
+            max_bytes = self.max_bytes
+        else:
+            self._reject(part, UnsupportedAudioTypeError("Unsupported audio content type"))
+            return
+
+        part.incoming = IncomingAudioFile(
+            self.media_root,
+            max_bytes=max_bytes,
+            content_type=None if part.archive else part.content_type,
+        )
+        self._open.append(part.incoming)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._part
+        if part.skipped:
+            return
+        if part.incoming is not None:
+            self._pending_writes.append((part, data[start:end]))
+            return
+        if len(part.data) + (end - start) > MAX_FIELD_BYTES:
+            raise MultipartError("Form field exceeds allowed size")
+        part.data.extend(data[start:end])
+
+    def _reject(self, part: _Part, error: Exception) -> None:
+        """Skip the rest of ``part``, or abort the whole request if not collecting rejections."""
+
+        if not self.reject_invalid:
+            raise error
+        if part.incoming is not None:
+            part.incoming.discard()
+            self._open.remove(part.incoming)
+            part.incoming = None
+        part.skipped = True
+        self.form.rejected.append(RejectedPart(part.name, part.filename, str(error)))
+
+    def on_part_end(self) -> None:
+        part = self._part
+        if part.skipped:
+            return
+        if part.incoming is None:
+            self.form.fields[part.name] = part.data.decode("utf-8", "replace")
+        else:
+            self._finished.append(part)
+
+    async def drain(self) -> None:
+        """Flush bytes collected by the parser callbacks to disk off the event loop."""
+
+        for part, data in self._pending_writes:
+            if part.skipped or part.incoming is None:
+                continue
+            try:
+                await run_in_threadpool(part.incoming.write, data)
+            except (UploadTooLargeError, AudioContentMismatchError) as exc:
+                self._reject(part, exc)
+        self._pending_writes.clear()
+
+        for part in self._finished:
+            if part.skipped or part.incoming is None:
+                continue
+            incoming = part.incoming
+            self._open.remove(incoming)
+            if part.archive:
+                path = await run_in_threadpool(incoming.close)
+                self.form.archives.append(ReceivedArchive(part.name, part.filename, path))
+                continue
+            try:
+                stored = await run_in_threadpool(incoming.commit)
+            except AudioContentMismatchError as exc:
+                # a body shorter than the sniffed prefix is only judged here
+                incoming.discard()
+                part.incoming = None
+                self._reject(part, exc)
+                continue
+            self.form.files.append(
+                ReceivedAudio(part.name, part.filename, part.content_type, stored)
+            )
+        self._finished.clear()
+
+    def discard(self) -> None:
+        for incoming in self._open:
+            incoming.discard()
+        self._open.clear()
+
+
+async def receive_multipart_audio(
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    media_root: Path,
+    *,
+    max_bytes: int | None,
+    allowed_types: Collection[str],
+    max_files: int = 1,
+    reject_invalid: bool = False,
+    archive_types: Collection[str] = (),
+    max_archive_bytes: int | None = None,
+) -> MultipartAudioForm:
+    """Parse a ``multipart/form-data`` body, writing file parts straight to storage.
+
+    Unlike ``Request.form()`` nothing is spooled to a temporary file first:
+    each file part is hashed and written into ``MEDIA_ROOT`` as it arrives and
+    then renamed to its content-addressed location. Size and content type
+    limits are enforced while the body is still being received, and the
+    leading bytes of each file must match the audio type its part declares.
+
+    With ``reject_invalid`` a file part that breaks those limits is skipped
+    and reported in ``rejected`` instead of failing the whole request. Parts
+    whose content type is in ``archive_types`` are kept as temp files in
+    ``archives`` for the caller to unpack and remove.
+    """
+
+    mime, params = parse_options_header(content_type)
+    if mime != b"multipart/form-data" or b"boundary" not in params:
+        raise MultipartError("Expected a multipart/form-data body")
+
+    receiver = _AudioFormParser(
+        media_root,
+        max_bytes=max_bytes,
+        allowed_types=allowed_types,
+        max_files=max_files,
+        reject_invalid=reject_invalid,
+        archive_types=archive_types,
+        max_archive_bytes=max_archive_bytes,
+    )
+    parser = MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": receiver.on_part_begin,
+            "on_part_data": receiver.on_part_data,
+            "on_part_end": receiver.on_part_end,
+            "on_header_field": receiver.on_header_field,
+            "on_header_value": receiver.on_header_value,
+            "on_header_end": receiver.on_header_end,
+            "on_headers_finished": receiver.on_headers_finished,
+        },
+    )
+
+    try:
+        async for chunk in chunks:
+            parser.write(chunk)
+            await receiver.drain()
+        parser.finalize()
+        await receiver.drain()
+    except BaseException as exc:
+        receiver.discard()
+        receiver.form.discard()
+        if isinstance(exc, MultipartParseError):
+            raise MultipartError(str(exc)) from exc
+        raise
+
+    return receiver.form
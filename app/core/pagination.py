@@ -0,0 +1,33 @@
+"""Opaque cursors for keyset pagination."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+    pass
+
+
+def encode_cursor(*values: str | int) -> str:
+    """Encode the sort key of the last row on a page into an opaque token."""
+
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, arity: int) -> list[str | int]:
+    """Decode a token produced by ``encode_cursor`` back into its sort key."""
+
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as exc:
+        raise InvalidCursorError("Malformed pagination cursor") from exc
+    if not isinstance(values, list) or len(values) != arity:
+        raise InvalidCursorError("Malformed pagination cursor")
+    return values
@@ -0,0 +1,231 @@
+"""Write-behind aggregation of play counts."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from datetime import datetime, timezone
+import logging
+import time
+from typing import AsyncContextManager, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import sessionmanager
+from app.core.leaderboard import StreamLeaderboard, stream_leaderboard
+from app.core.metrics import (
+    PLAYCOUNT_DROPPED,
+    PLAYCOUNT_FLUSH_BATCH_SIZE,
+    PLAYCOUNT_FLUSH_FAILURES,
+    PLAYCOUNT_FLUSH_LAG,
+    PLAYCOUNT_PENDING,
+    PLAYS,
+    PLAYS_PER_SONG_FLUSH,
+    PLAYS_SUPPRESSED,
+)
+from app.models.stats import PlayBucket, PlayCount
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], AsyncContextManager[AsyncSession]]
+
+
+class PlayCountAggregator:
+    """Buffer play increments in memory and flush them as one bulk upsert.
+
+    Plays are recorded synchronously on the stream hot path. A background task
+    flushes the buffer every ``flush_interval`` seconds, or sooner once
+    ``max_pending`` plays are waiting. Failed flushes are merged back into the
+    buffer so no increments are lost, up to ``max_pending_songs`` distinct
+    songs; while the database stays unreachable, plays of further songs are
+    dropped and counted in ``mosic_playcount_dropped`` rather than growing
+    the buffer without bound.
+
+    Each flush also adds its plays to the current hourly and daily play
+    history buckets, so a play lands in the bucket of the flush that persisted
+    it (normally within ``flush_interval`` of the play).
+    """
+
+    def __init__(
+        self,
+        *,
+        flush_interval: float,
+        max_pending: int,
+        max_pending_songs: int = 100_000,
+        session_factory: SessionFactory | None = None,
+        leaderboard: StreamLeaderboard | None = None,
+    ):
+        self.flush_interval = flush_interval
+        self.leaderboard = leaderboard or stream_leaderboard
+        self.max_pending = max(max_pending, 1)
+        self.max_pending_songs = max(max_pending_songs, 1)
+        self._session_factory: SessionFactory = session_factory or sessionmanager.session
+        self._pending: dict[str, int] = {}
+        self._titles: dict[str, str] = {}
+        self._pending_plays = 0
+        self._oldest: float | None = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending_plays
+
+    def record(self, song_id: str, title: str) -> None:
+        """Buffer a single play of ``song_id``."""
+
+        if song_id not in self._pending and len(self._pending) >= self.max_pending_songs:
+            PLAYCOUNT_DROPPED.inc()
+            return
+        self._pending[song_id] = self._pending.get(song_id, 0) + 1
+        self._titles[song_id] = title
+        self._pending_plays += 1
+        PLAYS.inc()
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        PLAYCOUNT_PENDING.set(self._pending_plays)
+        if self._pending_plays >= self.max_pending:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Persist all buffered plays in a single transaction."""
+
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, titles, oldest = self._pending, self._titles, self._oldest
+            self._pending, self._titles, self._oldest = {}, {}, None
+            self._pending_plays = 0
+            PLAYCOUNT_PENDING.set(0)
+
+            try:
+                async with self._session_factory() as session:
+                    counts = await PlayCount.bulk_increment(
+                        session, pending, at=datetime.now(timezone.utc)
+                    )
+            except Exception:
+                PLAYCOUNT_FLUSH_FAILURES.inc()
+                self._requeue(pending, titles, oldest)
+                raise
+
+            if oldest is not None:
+                PLAYCOUNT_FLUSH_LAG.observe(time.monotonic() - oldest)
+            PLAYCOUNT_FLUSH_BATCH_SIZE.observe(len(pending))
+            for delta in pending.values():
+                PLAYS_PER_SONG_FLUSH.observe(delta)
+            for song_id, count in counts.items():
+                self.leaderboard.update(song_id, titles[song_id], count)
+
+    def _requeue(
+        self, pending: dict[str, int], titles: dict[str, str], oldest: float | None
+    ) -> None:
+        dropped = 0
+        for song_id, delta in pending.items():
+            if song_id not in self._pending and len(self._pending) >= self.max_pending_songs:
+                dropped += delta
+                continue
+            self._pending[song_id] = self._pending.get(song_id, 0) + delta
+            self._titles.setdefault(song_id, titles[song_id])
+            self._pending_plays += delta
+        if dropped:
+            PLAYCOUNT_DROPPED.inc(dropped)
+            logger.error(
+                "Play count buffer is full (%d songs), dropped %d plays", self.max_pending_songs, dropped
+            )
+        if oldest is not None and (self._oldest is None or oldest < self._oldest):
+            self._oldest = oldest
+        PLAYCOUNT_PENDING.set(self._pending_plays)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the background flusher and persist anything still buffered."""
+
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final play count flush failed, %d plays lost", self.pending)
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Play count flush failed, retrying next interval")
+
+
+async def run_play_history_compaction(
+    *, interval: float, session_factory: SessionFactory | None = None
+) -> None:
+    """Periodically drop play history buckets past their retention until cancelled."""
+
+    while True:
+        try:
+            async with (session_factory or sessionmanager.session)() as session:
+                pruned = await PlayBucket.prune(session)
+            if pruned:
+                logger.info("Pruned %d expired play history buckets", pruned)
+        except Exception:
+            logger.exception("Play history compaction failed")
+        await asyncio.sleep(interval)
+
+
+class PlayDedupWindow:
+    """Count at most one play per listener and song within ``window`` seconds.
+
+    Retries, seeks and prefetches all arrive as separate stream requests; only
+    the first one in the window is recorded, the rest never reach the
+    aggregator or the database. Listeners are remembered in a ``TTLCache``
+    capped at ``max_entries``, so under pressure the oldest are forgotten
+    first and at worst a repeat play is counted.
+    """
+
+    def __init__(self, *, window: float, max_entries: int):
+        self.window = window
+        self._seen: TTLCache[tuple[str, str], bool] = TTLCache(
+            "play_dedup", max_entries=max_entries, ttl=window
+        )
+
+    def admit(self, listener: str, song_id: str) -> bool:
+        """Return whether this play should be counted."""
+
+        if self.window <= 0:
+            return True
+        key = (listener, song_id)
+        hit, _ = self._seen.get(key)
+        if hit:
+            PLAYS_SUPPRESSED.inc()
+            return False
+        # the window runs from the counted play; suppressed repeats do not extend it
+        self._seen.set(key, True)
+        return True
+
+    def clear(self) -> None:
+        self._seen.clear()
+
+
+playcount_aggregator = PlayCountAggregator(
+    flush_interval=settings.PLAYCOUNT_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.PLAYCOUNT_FLUSH_MAX_PENDING,
+    max_pending_songs=settings.PLAYCOUNT_MAX_PENDING_SONGS,
+)
+
+play_dedup = PlayDedupWindow(
+    window=settings.PLAY_DEDUP_WINDOW_SECONDS,
+    max_entries=settings.PLAY_DEDUP_MAX_ENTRIES,
+)
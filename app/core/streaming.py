@@ -0,0 +1,484 @@
+"""HTTP range, conditional request and caching handling for audio streaming."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, formatdate, parsedate_to_datetime
+import os
+from pathlib import Path
+import re
+from secrets import token_hex
+import time
+from typing import BinaryIO, Callable, Mapping
+
+import anyio
+from fastapi.responses import JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import Message, Receive, Scope, Send
+
+from app.core.metrics import StreamObserver
+
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiableError(ValueError):
+    """Raised when none of the requested byte ranges overlap the resource."""
+
+    def __init__(self, size: int):
+        super().__init__(f"Requested range not satisfiable for {size} bytes")
+        self.size = size
+
+
+@dataclass(frozen=True, slots=True)
+class ByteRange:
+    start: int
+    end: int  # inclusive
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    def content_range(self, size: int) -> str:
+        return f"bytes {self.start}-{self.end}/{size}"
+
+
+def parse_range_header(header: str | None, size: int) -> list[ByteRange] | None:
+    """Parse a ``Range`` header into sorted, coalesced byte ranges.
+
+    Returns ``None`` when the header is absent or should be ignored (unknown
+    unit, malformed syntax, too many ranges), in which case the full resource
+    is served. Raises ``RangeNotSatisfiableError`` when the header is valid but
+    no range overlaps the resource.
+    """
+
+    if not header:
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    parts = [part.strip() for part in spec.split(",")]
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges: list[ByteRange] = []
+    for part in parts:
+        first, sep, last = part.partition("-")
+        first, last = first.strip(), last.strip()
+        if not sep or not (first or last):
+            return None
+        if (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+
+        if not first:
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                continue
+            ranges.append(ByteRange(max(size - suffix, 0), size - 1))
+            continue
+
+        start = int(first)
+        end = int(last) if last else size - 1
+        if end < start:
+            return None
+        if start >= size:
+            continue
+        ranges.append(ByteRange(start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiableError(size)
+
+    ranges.sort(key=lambda byte_range: byte_range.start)
+    merged = [ranges[0]]
+    for current in ranges[1:]:
+        previous = merged[-1]
+        if current.start <= previous.end + 1:
+            merged[-1] = ByteRange(previous.start, max(previous.end, current.end))
+        else:
+            merged.append(current)
+    return merged
+
+
+def file_validators(stat_result: os.stat_result) -> tuple[str, str]:
+    """Return an ``(etag, last_modified)`` pair for a file on disk."""
+
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    return etag, last_modified
+
+
+def if_range_matches(if_range: str | None, etag: str, last_modified: str | None) -> bool:
+    """Evaluate an ``If-Range`` precondition against the current validators."""
+
+    if if_range is None:
+        return True
+    value = if_range.strip()
+    if value.startswith("W/"):
+        return False
+    if value.startswith('"'):
+        return value == etag
+    return value == last_modified
+
+
+def http_date(moment: datetime) -> str:
+    """Format a datetime as an HTTP date; naive values are taken as UTC."""
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str, last_modified: str | None) -> bool:
+    """Evaluate ``If-None-Match``, or failing that ``If-Modified-Since``, for a GET or HEAD."""
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return if_none_match_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def not_modified_response(etag: str, last_modified: str | None, cache_control: str | None) -> Response:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = last_modified
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
+
+
+def if_none_match_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header lists ``etag`` (weak comparison)."""
+
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+@dataclass(frozen=True, slots=True)
+class FileSegment:
+    offset: int
+    count: int
+
+
+BodySegment = bytes | FileSegment
+
+
+class MediaFileResponse(Response):
+    """Send byte segments of a file without pulling them through a threadpool iterator.
+
+    When the server advertises the ASGI ``http.response.zerocopy`` extension
+    every file segment is handed over as an ``(offset, count)`` pair so the
+    server can ``os.sendfile`` it straight from the page cache. Whole-file
+    responses can alternatively use ``http.response.pathsend``. Otherwise the
+    file is read asynchronously in ``chunk_size`` pieces, or, when ``buffer``
+    holds the file's contents (e.g. a memory mapping), sent as ``memoryview``
+    slices of it without touching the file at all.
+
+    An optional ``observer`` is told how long opening the file took, when the
+    first body byte went out and how the response finished. ``on_open`` is
+    called once the file is known to exist, right before the response starts;
+    a missing file is answered with 404 and never reaches it.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        segments: list[BodySegment],
+        *,
+        file_size: int,
+        status_code: int = 200,
+        media_type: str | None = None,
+        headers: Mapping[str, str] | None = None,
+        chunk_size: int,
+        zero_copy: bool = True,
+        observer: StreamObserver | None = None,
+        buffer: memoryview | None = None,
+        on_open: Callable[[], None] | None = None,
+    ):
+        super().__init__(status_code=status_code, media_type=media_type, headers=headers)
+        self.file_path = file_path
+        self.file_size = file_size
+        self.segments = segments
+        self.chunk_size = chunk_size
+        self.zero_copy = zero_copy
+        self.observer = observer
+        self.buffer = buffer
+        self.on_open = on_open
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        outcome = "error"
+        try:
+            outcome = await self._send_response(scope, receive, send)
+        except (FileNotFoundError, PermissionError):
+            raise
+        except OSError:
+            # a send on a closed connection
+            outcome = "disconnect"
+            raise
+        finally:
+            if self.observer is not None:
+                self.observer.finish(outcome)
+
+    async def _send_response(self, scope: Scope, receive: Receive, send: Send) -> str:
+        extensions = scope.get("extensions") or {}
+        head_only = scope.get("method") == "HEAD"
+
+        if (
+            self.zero_copy
+            and not head_only
+            and "http.response.pathsend" in extensions
+            and self.segments == [FileSegment(0, self.file_size)]
+        ):
+            # the server opens the file only after taking the path
+            if not os.path.isfile(self.file_path):
+                return await self._send_not_found(scope, receive, send)
+            self._opened()
+            await self._send_start(send)
+            await self._emit(
+                send,
+                {"type": "http.response.pathsend", "path": os.path.abspath(self.file_path)},
+                self.file_size,
+            )
+            return "ok"
+
+        zerocopy = self.zero_copy and "http.response.zerocopy" in extensions
+        if self.buffer is not None and not zerocopy:
+            self._opened()
+            await self._send_start(send)
+            if not head_only:
+                await self._send_buffer(send, self.buffer)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return "ok"
+
+        opening = time.perf_counter()
+        try:
+            f = await anyio.open_file(self.file_path, "rb")
+        except OSError as exc:
+            if self.observer is not None:
+                self.observer.stage("file_open", time.perf_counter() - opening, "error")
+            if not isinstance(exc, FileNotFoundError):
+                raise
+            return await self._send_not_found(scope, receive, send)
+        if self.observer is not None:
+            self.observer.stage("file_open", time.perf_counter() - opening)
+        async with f:
+            self._opened()
+            await self._send_start(send)
+            if head_only:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return "ok"
+            if zerocopy:
+                await self._send_zerocopy(send, f.wrapped)
+            else:
+                await self._send_chunked(send, f)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        return "ok"
+
+    def _opened(self) -> None:
+        if self.on_open is not None:
+            self.on_open()
+
+    async def _send_not_found(self, scope: Scope, receive: Receive, send: Send) -> str:
+        # headers may come from the database without a stat, so the file can
+        # turn out to be missing only now
+        await JSONResponse({"detail": "Audio file not found"}, status_code=404)(scope, receive, send)
+        return "not_found"
+
+    async def _emit(self, send: Send, message: Message, size: int) -> None:
+        await send(message)
+        if self.observer is not None:
+            self.observer.sent(size)
+
+    async def _send_start(self, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+
+    async def _send_zerocopy(self, send: Send, file: BinaryIO) -> None:
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                await self._emit(
+                    send, {"type": "http.response.body", "body": segment, "more_body": True}, len(segment)
+                )
+                continue
+            await self._emit(
+                send,
+                {
+                    "type": "http.response.zerocopy",
+                    "file": file,
+                    "offset": segment.offset,
+                    "count": segment.count,
+                    "more_body": True,
+                },
+                segment.count,
+            )
+
+    async def _send_buffer(self, send: Send, buffer: memoryview) -> None:
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                await self._emit(
+                    send, {"type": "http.response.body", "body": segment, "more_body": True}, len(segment)
+                )
+                continue
+            end = segment.offset + segment.count
+            for start in range(segment.offset, end, self.chunk_size):
+                chunk = buffer[start : min(start + self.chunk_size, end)]
+                await self._emit(
+                    send, {"type": "http.response.body", "body": chunk, "more_body": True}, len(chunk)
+                )
+
+    async def _send_chunked(self, send: Send, file: anyio.AsyncFile[bytes]) -> None:
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                await self._emit(
+                    send, {"type": "http.response.body", "body": segment, "more_body": True}, len(segment)
+                )
+                continue
+            await file.seek(segment.offset)
+            remaining = segment.count
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await self._emit(
+                    send, {"type": "http.response.body", "body": chunk, "more_body": True}, len(chunk)
+                )
+
+
+def ranged_file_response(
+    file_path: Path,
+    media_type: str,
+    request_headers: Mapping[str, str],
+    *,
+    size: int,
+    etag: str,
+    last_modified: str | None = None,
+    cache_control: str | None = None,
+    chunk_size: int,
+    zero_copy: bool = True,
+    observer: StreamObserver | None = None,
+    buffer: memoryview | None = None,
+    on_open: Callable[[], None] | None = None,
+) -> Response:
+    """Build a full (200), partial (206) or unsatisfiable (416) file response.
+
+    ``size`` and the validators can come from a ``stat`` or from stored
+    metadata; the file itself is only opened once the body is sent.
+    """
+
+    headers = {"Accept-Ranges": "bytes", "ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = last_modified
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+
+    ranges: list[ByteRange] | None = None
+    if if_range_matches(request_headers.get("if-range"), etag, last_modified):
+        try:
+            ranges = parse_range_header(request_headers.get("range"), size)
+        except RangeNotSatisfiableError:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+
+    status_code = 206
+    if ranges is None:
+        status_code = 200
+        segments: list[BodySegment] = [FileSegment(0, size)]
+    elif len(ranges) == 1:
+        (byte_range,) = ranges
+        headers["Content-Range"] = byte_range.content_range(size)
+        segments = [FileSegment(byte_range.start, byte_range.length)]
+    else:
+        boundary = token_hex(16)
+        segments = []
+        for index, byte_range in enumerate(ranges):
+            # every part after the first is preceded by the CRLF that ends the previous part
+            part_header = (
+                ("\r\n" if index else "")
+                + f"--{boundary}\r\n"
+                + f"Content-Type: {media_type}\r\n"
+                + f"Content-Range: {byte_range.content_range(size)}\r\n\r\n"
+            )
+            segments.append(part_header.encode("latin-1"))
+            segments.append(FileSegment(byte_range.start, byte_range.length))
+        segments.append(f"\r\n--{boundary}--\r\n".encode("latin-1"))
+        media_type = f"multipart/byteranges; boundary={boundary}"
+
+    headers["Content-Length"] = str(
+        sum(len(s) if isinstance(s, bytes) else s.count for s in segments)
+    )
+    return MediaFileResponse(
+        file_path,
+        segments,
+        file_size=size,
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+        chunk_size=chunk_size,
+        zero_copy=zero_copy,
+        observer=observer,
+        buffer=buffer,
+        on_open=on_open,
+    )
+
+
+# uploads are stored as <sha256><format suffix>, so their bytes never change
+_CONTENT_ADDRESSED_NAME = re.compile(r"[0-9a-f]{64}(\.[A-Za-z0-9]+)?")
+
+
+class MediaStaticFiles(StaticFiles):
+    """``StaticFiles`` with a ``Cache-Control`` policy for the media library.
+
+    Content-addressed files get ``immutable_cache_control``; anything else,
+    such as files placed there by hand, gets ``cache_control``. Starlette
+    already answers ``If-None-Match``/``If-Modified-Since`` with 304.
+
+    Paths with a segment starting with a dot are answered with 404: the
+    upload temp files and resumable sessions live in ``.incoming`` and
+    ``.uploads`` under the same root and must never be downloadable.
+    """
+
+    def __init__(
+        self,
+        *,
+        immutable_cache_control: str,
+        cache_control: str,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.immutable_cache_control = immutable_cache_control
+        self.cache_control = cache_control
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if any(part.startswith(".") for part in re.split(r"[/\\]", path)):
+            raise StarletteHTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if _CONTENT_ADDRESSED_NAME.fullmatch(os.path.basename(full_path)):
+            policy = self.immutable_cache_control
+        else:
+            policy = self.cache_control
+        if policy:
+            response.headers["Cache-Control"] = policy
+        return response
@@ -0,0 +1,308 @@
+"""Resumable upload sessions stored next to the media library."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import time
+from typing import AsyncIterator, BinaryIO, Iterator
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.media import (
+    SNIFF_BYTES,
+    StoredAudio,
+    UploadTooLargeError,
+    audio_format_for_type,
+    check_audio_head,
+    commit_to_store,
+    hash_file,
+)
+
+_UPLOADS_DIR = ".uploads"
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+logger = logging.getLogger(__name__)
+
+
+class UploadSessionNotFound(LookupError):
+    """Raised when an upload session does not exist or has expired."""
+
+    pass
+
+
+class UploadOffsetMismatch(ValueError):
+    """Raised when a chunk does not start at the session's current offset."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class UploadSessionBusy(RuntimeError):
+    """Raised when another request is already writing to the upload session."""
+
+    pass
+
+
+class UploadIncompleteError(ValueError):
+    """Raised when finalizing a session before all declared bytes arrived."""
+
+    pass
+
+
+@dataclass(slots=True)
+class UploadSession:
+    id: str
+    filename: str | None
+    content_type: str
+    length: int | None
+    created_at: float
+    offset: int = 0
+
+
+def _uploads_root(media_root: Path) -> Path:
+    root = media_root / _UPLOADS_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _session_paths(media_root: Path, upload_id: str) -> tuple[Path, Path]:
+    if not _UPLOAD_ID_RE.match(upload_id):
+        raise UploadSessionNotFound(upload_id)
+    root = _uploads_root(media_root)
+    return root / f"{upload_id}.json", root / f"{upload_id}.part"
+
+
+# sessions held by a request in this process
+_held_sessions: set[str] = set()
+
+
+@contextmanager
+def _hold_session(media_root: Path, upload_id: str) -> Iterator[BinaryIO]:
+    """Hold ``upload_id`` exclusively and yield its part file opened for appending.
+
+    Other requests for the session, in this or another worker, fail with
+    ``UploadSessionBusy`` instead of waiting, so two writers can never both
+    pass the offset check and append the same bytes twice.
+    """
+
+    _, part_path = _session_paths(media_root, upload_id)
+    if upload_id in _held_sessions:
+        raise UploadSessionBusy(upload_id)
+    try:
+        # no O_CREAT: a discarded session must not be recreated
+        fd = os.open(part_path, os.O_WRONLY | os.O_APPEND)
+    except FileNotFoundError as exc:
+        raise UploadSessionNotFound(upload_id) from exc
+    with os.fdopen(fd, "ab") as part:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError as exc:
+                raise UploadSessionBusy(upload_id) from exc
+        _held_sessions.add(upload_id)
+        try:
+            yield part
+        finally:
+            _held_sessions.discard(upload_id)
+
+
+def create_upload_session(
+    media_root: Path,
+    *,
+    filename: str | None,
+    content_type: str,
+    length: int | None,
+    max_bytes: int | None = None,
+) -> UploadSession:
+    """Start a new resumable upload and return its (empty) session."""
+
+    if max_bytes is not None and length is not None and length > max_bytes:
+        raise UploadTooLargeError("Uploaded file exceeds allowed size")
+
+    session = UploadSession(
+        id=uuid4().hex,
+        filename=filename,
+        content_type=content_type,
+        length=length,
+        created_at=time.time(),
+    )
+    meta_path, part_path = _session_paths(media_root, session.id)
+    part_path.touch()
+    meta_path.write_text(
+        json.dumps(
+            {
+                "filename": session.filename,
+                "content_type": session.content_type,
+                "length": session.length,
+                "created_at": session.created_at,
+            }
+        )
+    )
+    return session
+
+
+def get_upload_session(media_root: Path, upload_id: str) -> UploadSession:
+    meta_path, part_path = _session_paths(media_root, upload_id)
+    try:
+        meta = json.loads(meta_path.read_text())
+        offset = part_path.stat().st_size
+    except (OSError, ValueError) as exc:
+        raise UploadSessionNotFound(upload_id) from exc
+    return UploadSession(id=upload_id, offset=offset, **meta)
+
+
+async def append_upload_chunk(
+    media_root: Path,
+    upload_id: str,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    *,
+    max_bytes: int | None = None,
+) -> UploadSession:
+    """Append a request body at ``offset`` and return the updated session.
+
+    Bytes are written as they arrive, so a dropped connection keeps whatever
+    was received and the client resumes from the reported offset. Raises
+    ``UploadSessionBusy`` while another request is appending.
+    """
+
+    with _hold_session(media_root, upload_id) as part:
+        # read the offset only once the session is held
+        session = get_upload_session(media_root, upload_id)
+        if offset != session.offset:
+            raise UploadOffsetMismatch(session.offset)
+
+        limit = max_bytes
+        if session.length is not None:
+            limit = session.length if limit is None else min(limit, session.length)
+
+        _, part_path = _session_paths(media_root, upload_id)
+        expected = audio_format_for_type(session.content_type)
+        sniffing = session.offset < SNIFF_BYTES
+        head = await anyio.Path(part_path).read_bytes() if sniffing else b""
+        buffer = anyio.wrap_file(part)
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if limit is not None and session.offset + len(chunk) > limit:
+                raise UploadTooLargeError("Uploaded file exceeds allowed size")
+            if sniffing:
+                # reject a body that is not the declared audio before writing it
+                head += chunk
+                if len(head) >= SNIFF_BYTES:
+                    check_audio_head(head[:SNIFF_BYTES], expected)
+                    sniffing = False
+            await buffer.write(chunk)
+            session.offset += len(chunk)
+    return session
+
+
+async def finalize_upload_session(media_root: Path, upload_id: str) -> StoredAudio:
+    """Move a completed upload into content-addressed storage."""
+
+    with _hold_session(media_root, upload_id):
+        session = get_upload_session(media_root, upload_id)
+        if session.length is not None and session.offset != session.length:
+            raise UploadIncompleteError(
+                f"Upload has {session.offset} of {session.length} bytes"
+            )
+
+        meta_path, part_path = _session_paths(media_root, upload_id)
+
+        def _commit() -> StoredAudio:
+            with part_path.open("rb") as f:
+                audio_format = check_audio_head(
+                    f.read(SNIFF_BYTES), audio_format_for_type(session.content_type)
+                )
+            content_hash, size = hash_file(part_path)
+            return commit_to_store(part_path, media_root, content_hash, size, audio_format)
+
+        stored = await run_in_threadpool(_commit)
+        meta_path.unlink(missing_ok=True)
+    return stored
+
+
+def discard_upload_session(media_root: Path, upload_id: str) -> None:
+    meta_path, part_path = _session_paths(media_root, upload_id)
+    if not meta_path.exists():
+        raise UploadSessionNotFound(upload_id)
+    with _hold_session(media_root, upload_id):
+        part_path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+
+
+def purge_expired_upload_sessions(media_root: Path, ttl: float) -> int:
+    """Delete sessions whose last write is older than ``ttl`` seconds."""
+
+    root = media_root / _UPLOADS_DIR
+    if not root.is_dir():
+        return 0
+
+    cutoff = time.time() - ttl
+    purged = 0
+    for meta_path in root.glob("*.json"):
+        part_path = meta_path.with_suffix(".part")
+        try:
+            last_activity = max(
+                meta_path.stat().st_mtime,
+                part_path.stat().st_mtime if part_path.exists() else 0,
+            )
+        except FileNotFoundError:
+            continue
+        if last_activity < cutoff:
+            part_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            purged += 1
+    return purged
+
+
+async def run_upload_session_gc(media_root: Path, *, ttl: float, interval: float) -> None:
+    """Periodically purge abandoned upload sessions until cancelled."""
+
+    while True:
+        try:
+            purged = await run_in_threadpool(purge_expired_upload_sessions, media_root, ttl)
+            if purged:
+                logger.info("Purged %d abandoned upload sessions", purged)
+        except Exception:
+            logger.exception("Upload session garbage collection failed")
+        await asyncio.sleep(interval)
+
+
+# FASTAPI VIEWS
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str | None = None
+    content_type: str
+    length: int | None = Field(default=None, ge=0)
+
+
+class UploadSessionComplete(BaseModel):
+    title: str | None = None
+    description: str | None = None
+
+
+class UploadSessionRead(BaseModel):
+    id: str
+    filename: str | None = None
+    content_type: str
+    length: int | None = None
+    offset: int
+    model_config = ConfigDict(from_attributes=True)
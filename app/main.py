@@ -1,25 +1,58 @@
 from contextlib import asynccontextmanager
-import time
+import asyncio
+import logging
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
 from app.core.db import sessionmanager
+from app.core.ingest import ingest_pipeline
+from app.core.leaderboard import stream_leaderboard
+from app.core.playcounts import playcount_aggregator, run_play_history_compaction
+from app.core.streaming import MediaStaticFiles
+from app.core.uploads import run_upload_session_gc
+from app.models.catalogue import catalogue_cache
 from sqlalchemy.exc import NoResultFound
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette_exporter import PrometheusMiddleware, handle_metrics
 
 from app.routers import play
-from app.core.metrics import REQUEST_LATENCY, TOTAL_API_REQUESTS
+from app.core.metrics import RequestMetricsMiddleware
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Initializing session manager")
     sessionmanager.init(settings.database_url, {"echo": settings.ECHO_SQL})
+    try:
+        await stream_leaderboard.seed()
+    except Exception:
+        logger.exception("Could not seed stream metrics from the database")
+    playcount_aggregator.start()
+    if settings.INGEST_MODE == "background":
+        await ingest_pipeline.resume_pending()
+    upload_gc = asyncio.create_task(
+        run_upload_session_gc(
+            settings.media_path,
+            ttl=settings.UPLOAD_SESSION_TTL_SECONDS,
+            interval=settings.UPLOAD_SESSION_GC_INTERVAL_SECONDS,
+        )
+    )
+    catalogue_watch = asyncio.create_task(catalogue_cache.watch())
+    history_compaction = asyncio.create_task(
+        run_play_history_compaction(interval=settings.PLAY_HISTORY_COMPACTION_INTERVAL_SECONDS)
+    )
     yield
+    upload_gc.cancel()
+    catalogue_watch.cancel()
+    history_compaction.cancel()
+    print("Waiting for background ingest")
+    await ingest_pipeline.close()
+    print("Flushing play counts")
+    await playcount_aggregator.close()
     print("Closing session manager")
     await sessionmanager.close()
     print("Session manager closed")
@@ -33,10 +66,15 @@ app.add_middleware(
     app_name="mosic",
     prefix="mosic",
 )
+app.add_middleware(RequestMetricsMiddleware)
 app.add_route("/metrics", handle_metrics)
 app.mount(
     settings.media_url_path,
-    StaticFiles(directory=str(settings.media_path)),
+    MediaStaticFiles(
+        directory=str(settings.media_path),
+        immutable_cache_control=settings.MEDIA_IMMUTABLE_CACHE_CONTROL,
+        cache_control=settings.MEDIA_CACHE_CONTROL,
+    ),
     name="media",
 )
 app.include_router(play.router)
@@ -51,15 +89,3 @@ async def validation_exception_handler(request, exc):
 async def http_exception_handler(request, exc):
     return JSONResponse({"detail": str(exc.detail)}, status_code=exc.status_code)
 
-
-@app.middleware("http")
-async def request_metrics(request: Request, call_next):
-    start = time.perf_counter()
-    response = await call_next(request)
-    route = request.scope.get("route")
-    route_path = route.path if route else request.url.path
-    TOTAL_API_REQUESTS.labels(method=request.method).inc()
-    REQUEST_LATENCY.labels(method=request.method, path=route_path).observe(
-        time.perf_counter() - start
-    )
-    return response
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import logging
+from typing import AsyncContextManager, Callable, Hashable
+
+from sqlalchemy import DDL, BigInteger, Connection, Integer, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import Base, sessionmanager
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], AsyncContextManager[AsyncSession]]
+
+# set on a session whose transaction changed the catalogue
+_CHANGED_KEY = "catalogue_changed"
+
+
+class CatalogueVersion(Base):
+    """A single row counting catalogue writes, shared by every worker."""
+
+    __tablename__ = "catalogue_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    @classmethod
+    def bump_statement(cls):
+        return update(cls).where(cls.id == 1).values(version=cls.version + 1)
+
+    @classmethod
+    async def bump(cls, session: AsyncSession) -> None:
+        """Bump the version inside the caller's transaction.
+
+        For writes that bypass the ORM flush (bulk statements); the local
+        cache is dropped once the transaction commits.
+        """
+
+        await session.execute(cls.bump_statement())
+        session.info[_CHANGED_KEY] = True
+
+    @classmethod
+    async def current(cls, session: AsyncSession) -> int:
+        result = await session.execute(select(cls.version).where(cls.id == 1))
+        return result.scalar_one_or_none() or 0
+
+
+event.listen(
+    CatalogueVersion.__table__,
+    "after_create",
+    DDL("INSERT INTO catalogue_version (id, version) VALUES (1, 0)"),
+)
+
+
+def mark_catalogue_changed(session: Session, connection: Connection) -> None:
+    """Bump the version from a flush that wrote songs (see ``app.models.song``)."""
+
+    connection.execute(CatalogueVersion.bump_statement())
+    session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_cached_catalogue(session: Session) -> None:
+    if session.info.pop(_CHANGED_KEY, False):
+        catalogue_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_catalogue_change(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+
+
+class CatalogueCache:
+    """Encoded catalogue pages keyed by the catalogue version.
+
+    The version is read from the database only when unknown: after a local
+    write commits, or at startup. Writes made by other workers are picked up
+    by ``watch``, which polls the version row every ``poll_interval`` seconds.
+    Pages are keyed on the version they were built for, so a page rendered
+    from data that changed meanwhile is never served under the new version.
+    """
+
+    def __init__(self, *, max_pages: int, ttl: float, poll_interval: float):
+        self.poll_interval = poll_interval
+        self.pages: TTLCache[tuple, tuple[bytes, str | None]] = TTLCache(
+            "catalogue", max_entries=max_pages, ttl=ttl
+        )
+        self._version: int | None = None
+        # bumped by every invalidation, so a poll that raced one is discarded
+        self._generation = 0
+
+    @property
+    def known_version(self) -> int | None:
+        return self._version
+
+    async def version(self, session: AsyncSession) -> int:
+        if self._version is not None:
+            return self._version
+        generation = self._generation
+        version = await CatalogueVersion.current(session)
+        if generation == self._generation:
+            self.observe(version)
+        return version
+
+    def observe(self, version: int) -> None:
+        """Adopt ``version`` as current, dropping pages of older versions."""
+
+        if version != self._version:
+            self.pages.clear()
+            self._version = version
+
+    def invalidate(self) -> None:
+        self.pages.clear()
+        self._version = None
+        self._generation += 1
+
+    @staticmethod
+    def etag(version: int, key: Hashable) -> str:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+        return f'"catalogue-{version}-{digest}"'
+
+    async def poll(self, session_factory: SessionFactory | None = None) -> None:
+        """Adopt the version stored in the database, e.g. after another worker wrote."""
+
+        generation = self._generation
+        async with (session_factory or sessionmanager.session)() as session:
+            version = await CatalogueVersion.current(session)
+        if generation == self._generation:
+            self.observe(version)
+
+    async def watch(self, session_factory: SessionFactory | None = None) -> None:
+        """``poll`` every ``poll_interval`` seconds until cancelled."""
+
+        while True:
+            try:
+                await self.poll(session_factory)
+            except Exception:
+                logger.exception("Polling the catalogue version failed")
+            await asyncio.sleep(self.poll_interval)
+
+
+catalogue_cache = CatalogueCache(
+    max_pages=settings.CATALOGUE_CACHE_MAX_PAGES,
+    ttl=settings.CATALOGUE_CACHE_TTL_SECONDS,
+    poll_interval=settings.CATALOGUE_VERSION_POLL_SECONDS,
+)
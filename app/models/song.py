@@ -1,22 +1,84 @@
+from datetime import datetime, timezone
+from enum import StrEnum
+from itertools import chain
 from uuid import uuid4
-from typing import Sequence
+from typing import Any, AsyncIterable, AsyncIterator, Collection, Iterable, Literal, Mapping, Sequence
 
-from sqlalchemy import String, select, Integer
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Index,
+    Integer,
+    Row,
+    String,
+    case,
+    event,
+    func,
+    insert,
+    or_,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import InstrumentedAttribute, Mapped, Session, mapped_column
 
-from app.core.db import Base
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.db import Base, dialect_insert, prefix_match
+from app.models.catalogue import CatalogueVersion, mark_catalogue_changed
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class SongCreateError(RuntimeError):
     """Raised when persisting a Song fails."""
 
 
+class SongStatus(StrEnum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+
+
+ConflictMode = Literal["error", "ignore", "update"]
+
+
+async def _aiter_rows(
+    rows: Iterable[Mapping[str, Any]] | AsyncIterable[Mapping[str, Any]],
+) -> AsyncIterator[Mapping[str, Any]]:
+    if isinstance(rows, AsyncIterable):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+# describe the file behind audio_url; streams trust them, so an upsert that
+# points a song at another file must not keep the old values
+_FILE_COLUMNS = ("content_hash", "size_bytes", "mime_type", "codec", "bitrate", "sample_rate")
+
+song_cache: TTLCache[str, "SongRead"] = TTLCache(
+    "song",
+    max_entries=settings.SONG_CACHE_MAX_ENTRIES,
+    ttl=settings.SONG_CACHE_TTL_SECONDS,
+    negative_ttl=settings.SONG_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+
 class Song(Base):
     __tablename__ = "songs"
+    __table_args__ = (
+        Index("ix_songs_title_id", "title", "id"),
+        Index("ix_songs_duration", "duration"),
+        # under a non-C collation a plain btree cannot serve LIKE 'prefix%'; on
+        # SQLite the GLOB from prefix_match seeks ix_songs_title_id instead
+        Index(
+            "ix_songs_title_pattern", "title", postgresql_ops={"title": "text_pattern_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[str] = mapped_column(
         String, primary_key=True, default=lambda: str(uuid4())
@@ -25,6 +87,24 @@ class Song(Base):
     description: Mapped[str | None] = mapped_column(String, nullable=True)
     duration: Mapped[int] = mapped_column(Integer, nullable=False)
     audio_url: Mapped[str] = mapped_column(String, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(
+        String(64), nullable=True, unique=True, index=True
+    )
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    mime_type: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    codec: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    bitrate: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    sample_rate: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # stored files never change, so this doubles as their Last-Modified
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, default=lambda: datetime.now(timezone.utc)
+    )
+    status: Mapped[str] = mapped_column(
+        String(16),
+        nullable=False,
+        default=SongStatus.READY,
+        server_default=SongStatus.READY,
+    )
 
     @classmethod
     async def get_by_id(cls, session: AsyncSession, song_id: str) -> "Song":
@@ -36,11 +116,68 @@ class Song(Base):
         return song
 
     @classmethod
-    async def list_all(cls, session: AsyncSession) -> Sequence["Song"]:
-        stmt = select(cls)
+    async def get_by_content_hash(
+        cls, session: AsyncSession, content_hash: str
+    ) -> "Song | None":
+        stmt = select(cls).where(cls.content_hash == content_hash)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def get_cached(cls, session: AsyncSession, song_id: str) -> "SongRead":
+        """Read-through lookup of an immutable song snapshot via ``song_cache``."""
+
+        hit, snapshot = song_cache.get(song_id)
+        if hit:
+            if snapshot is None:
+                raise NoResultFound(f"Song with id {song_id} not found")
+            return snapshot
+
+        try:
+            song = await cls.get_by_id(session, song_id)
+        except NoResultFound:
+            song_cache.set(song_id, None)
+            raise
+        snapshot = SongRead.model_validate(song)
+        # pending rows change once ingest finishes, possibly in another worker
+        if snapshot.status == SongStatus.READY:
+            song_cache.set(song_id, snapshot)
+        return snapshot
+
+    @classmethod
+    async def list_page(
+        cls,
+        session: AsyncSession,
+        *,
+        limit: int,
+        after: tuple[str, str] | None = None,
+        title_prefix: str | None = None,
+        min_duration: int | None = None,
+        max_duration: int | None = None,
+    ) -> Sequence[Row]:
+        """Return up to ``limit`` songs ordered by ``(title, id)`` after the given key.
+
+        Only the ``SongRead`` columns are selected and rows are returned as
+        plain tuples, so a page never populates the session's identity map.
+        """
+
+        stmt = select(*cls.read_columns()).order_by(cls.title, cls.id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(tuple_(cls.title, cls.id) > tuple_(*after))
+        if title_prefix:
+            stmt = stmt.where(prefix_match(session, cls.title, title_prefix))
+        if min_duration is not None:
+            stmt = stmt.where(cls.duration >= min_duration)
+        if max_duration is not None:
+            stmt = stmt.where(cls.duration <= max_duration)
         result = await session.execute(stmt)
-        songs = list(result.scalars().all())
-        return songs
+        return list(result.all())
+
+    @classmethod
+    def read_columns(cls) -> list[InstrumentedAttribute]:
+        """The columns behind ``SongRead``, for selects that skip ORM instances."""
+
+        return [getattr(cls, name) for name in SongRead.model_fields]
 
     @classmethod
     async def create(
@@ -50,9 +187,20 @@ class Song(Base):
         description: str | None,
         duration: int,
         audio_url: str,
+        content_hash: str | None = None,
+        size_bytes: int | None = None,
+        status: SongStatus = SongStatus.READY,
+        media_info: Mapping[str, Any] | None = None,
     ) -> "Song":
         song = cls(
-            title=title, description=description, duration=duration, audio_url=audio_url
+            title=title,
+            description=description,
+            duration=duration,
+            audio_url=audio_url,
+            content_hash=content_hash,
+            size_bytes=size_bytes,
+            status=status,
+            **(media_info or {}),
         )
         session.add(song)
         try:
@@ -66,6 +214,187 @@ class Song(Base):
         await session.refresh(song)
         return song
 
+    @classmethod
+    async def get_by_content_hashes(
+        cls, session: AsyncSession, content_hashes: Collection[str]
+    ) -> dict[str, "Song"]:
+        if not content_hashes:
+            return {}
+        stmt = select(cls).where(cls.content_hash.in_(content_hashes))
+        result = await session.execute(stmt)
+        return {song.content_hash: song for song in result.scalars()}
+
+    @classmethod
+    async def bulk_create(
+        cls,
+        session: AsyncSession,
+        rows: Iterable[Mapping[str, Any]] | AsyncIterable[Mapping[str, Any]],
+        *,
+        on_conflict: ConflictMode = "error",
+        batch_size: int | None = None,
+    ) -> list[str]:
+        """Insert ``rows`` with batched multi-row statements in one transaction.
+
+        Rows without an ``id`` get one generated up front, so no per-row
+        refresh is needed. With ``on_conflict="ignore"`` rows whose id (or
+        content hash) already exists are skipped; with ``"update"`` existing
+        rows get the new metadata. Returns the ids that were written, in input
+        order.
+        """
+
+        batch_size = batch_size or settings.BULK_CREATE_BATCH_SIZE
+        written: list[str] = []
+        try:
+            batch: list[dict[str, Any]] = []
+            async for row in _aiter_rows(rows):
+                batch.append({**row, "id": row.get("id") or str(uuid4())})
+                if len(batch) >= batch_size:
+                    written.extend(await cls._insert_batch(session, batch, on_conflict))
+                    batch = []
+            if batch:
+                written.extend(await cls._insert_batch(session, batch, on_conflict))
+            if written:
+                await CatalogueVersion.bump(session)
+            await session.commit()
+        except IntegrityError as exc:
+            await session.rollback()
+            raise SongCreateError("Failed to persist songs") from exc
+        except Exception:
+            await session.rollback()
+            raise
+        # core inserts bypass the mapper events that normally invalidate the cache
+        for song_id in written:
+            song_cache.invalidate(song_id)
+        return written
+
+    @classmethod
+    async def _insert_batch(
+        cls, session: AsyncSession, batch: list[dict[str, Any]], on_conflict: ConflictMode
+    ) -> list[str]:
+        ids = [row["id"] for row in batch]
+        if on_conflict == "error":
+            await session.execute(insert(cls).values(batch))
+            return ids
+
+        stmt = dialect_insert(session)(cls).values(batch)
+        if on_conflict == "ignore":
+            stmt = stmt.on_conflict_do_nothing()
+        else:
+            repointed = cls.audio_url != stmt.excluded.audio_url
+            file_columns = {
+                column: case(
+                    (repointed, stmt.excluded[column]),
+                    else_=func.coalesce(stmt.excluded[column], cls.__table__.c[column]),
+                )
+                for column in _FILE_COLUMNS
+            }
+            file_columns["created_at"] = case(
+                (repointed, stmt.excluded.created_at), else_=cls.created_at
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[cls.id],
+                set_={
+                    **{
+                        column: stmt.excluded[column]
+                        for column in ("title", "description", "duration", "audio_url")
+                    },
+                    **file_columns,
+                },
+            )
+        result = await session.execute(stmt.returning(cls.id))
+        returned = set(result.scalars())
+        return [song_id for song_id in ids if song_id in returned]
+
+    @classmethod
+    async def list_missing_media_info(
+        cls, session: AsyncSession, *, limit: int, after: str | None = None
+    ) -> Sequence["Song"]:
+        """Songs missing a stored size, MIME type or hash, ordered by id after ``after``."""
+
+        stmt = (
+            select(cls)
+            .where(
+                or_(cls.size_bytes.is_(None), cls.mime_type.is_(None), cls.content_hash.is_(None))
+            )
+            .order_by(cls.id)
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(cls.id > after)
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    @classmethod
+    async def update_media_info(
+        cls, session: AsyncSession, updates: Sequence[Mapping[str, Any]]
+    ) -> None:
+        """Apply per-row ``{"id": ..., <column>: ...}`` updates in one executemany."""
+
+        if not updates:
+            return
+        try:
+            await session.execute(update(cls), list(updates))
+            await CatalogueVersion.bump(session)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        # bulk updates by primary key bypass the mapper events
+        for row in updates:
+            song_cache.invalidate(row["id"])
+
+    @classmethod
+    async def list_pending(cls, session: AsyncSession) -> Sequence["Song"]:
+        stmt = select(cls).where(cls.status == SongStatus.PENDING)
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    @classmethod
+    async def apply_metadata(
+        cls,
+        session: AsyncSession,
+        song_id: str,
+        *,
+        title: str | None,
+        description: str | None,
+        duration: int | None,
+        status: SongStatus = SongStatus.READY,
+        media_info: Mapping[str, Any] | None = None,
+    ) -> "Song":
+        """Fill in extracted metadata for a pending song and mark it ``status``."""
+
+        song = await cls.get_by_id(session, song_id)
+        for field, value in (media_info or {}).items():
+            if value is not None:
+                setattr(song, field, value)
+        if title:
+            song.title = title
+        if description and not song.description:
+            song.description = description
+        if duration:
+            song.duration = duration
+        song.status = status
+        try:
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return song
+
+
+@event.listens_for(Song, "after_insert")
+@event.listens_for(Song, "after_update")
+@event.listens_for(Song, "after_delete")
+def _invalidate_cached_song(_mapper, _connection, target: Song) -> None:
+    song_cache.invalidate(target.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_catalogue_version(session: Session, _flush_context) -> None:
+    # new/dirty/deleted still describe what this flush wrote
+    if any(isinstance(obj, Song) for obj in chain(session.new, session.dirty, session.deleted)):
+        mark_catalogue_changed(session, session.connection())
+
 
 # FASTAPI VIEWS
 
@@ -83,4 +412,28 @@ class SongCreate(SongBase):
 
 class SongRead(SongBase):
     id: str
+    content_hash: str | None = None
+    size_bytes: int | None = None
+    mime_type: str | None = None
+    codec: str | None = None
+    bitrate: int | None = None
+    sample_rate: int | None = None
+    created_at: datetime | None = None
+    status: SongStatus = SongStatus.READY
     model_config = ConfigDict(from_attributes=True)
+
+
+class SongImport(SongBase):
+    id: str | None = Field(default=None, min_length=1, max_length=64)
+
+
+class SongBulkCreateResult(BaseModel):
+    ids: list[str]
+    skipped: list[str] = []
+
+
+class SongUploadResult(BaseModel):
+    filename: str | None = None
+    status: Literal["created", "duplicate", "rejected"]
+    detail: str | None = None
+    song: SongRead | None = None
@@ -1,54 +1,268 @@
-from sqlalchemy import String, select, Integer
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Mapping
+
+from sqlalchemy import DateTime, ForeignKey, Index, String, delete, func, or_, select, Integer
+from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.core.db import Base
-
-from pydantic import BaseModel, ConfigDict
+from app.core.config import settings
+from app.core.db import Base, dialect_insert
+from app.models.song import Song, SongRead
 
-from app.core.metrics import STREAMS_BY_CLIP
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class PlayCount(Base):
     __tablename__ = "play_counts"
 
-    id: Mapped[str] = mapped_column(String, primary_key=True)
+    # the primary key index on both sides keeps the songs join an index lookup
+    id: Mapped[str] = mapped_column(
+        String,
+        ForeignKey("songs.id", name="fk_play_counts_id_songs", ondelete="CASCADE"),
+        primary_key=True,
+    )
     count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     @classmethod
     async def get_by_id(cls, session: AsyncSession, playcount_id: str) -> "PlayCount":
+        """Return the stored count, or an unsaved zero count if never played."""
+
         stmt = select(cls).where(cls.id == playcount_id)
         result = await session.execute(stmt)
         playcount = result.scalar_one_or_none()
         if playcount is None:
             playcount = cls(id=playcount_id, count=0)
-            session.add(playcount)
-            await session.commit()
-            await session.refresh(playcount)
         return playcount
 
     @classmethod
-    async def increment_count(
-        cls, session: AsyncSession, playcount_id: str, song_title: str
-    ) -> int:
-        stmt = select(cls).where(cls.id == playcount_id).with_for_update()
+    async def stats_for_song(cls, session: AsyncSession, song_id: str) -> "SongStatsRead":
+        stats = await cls.stats_for(session, [song_id])
+        if song_id not in stats:
+            raise NoResultFound(f"Song with id {song_id} not found")
+        return stats[song_id]
+
+    @classmethod
+    async def stats_for(
+        cls, session: AsyncSession, song_ids: Collection[str]
+    ) -> dict[str, "SongStatsRead"]:
+        """Return song metadata and play counts for ``song_ids`` in one query.
+
+        Songs that were never played get a count of zero; nothing is written.
+        Unknown ids are absent from the result.
+        """
+
+        if not song_ids:
+            return {}
+        stmt = (
+            select(*Song.read_columns(), func.coalesce(cls.count, 0).label("count"))
+            .outerjoin(cls, cls.id == Song.id)
+            .where(Song.id.in_(song_ids))
+        )
+        result = await session.execute(stmt)
+        return {row.id: SongStatsRead.model_validate(row) for row in result}
+
+    @classmethod
+    async def top(
+        cls, session: AsyncSession, *, limit: int | None
+    ) -> list[tuple[str, str, int]]:
+        """Return ``(song_id, title, count)`` for the most played songs."""
+
+        stmt = (
+            select(cls.id, Song.title, cls.count)
+            .join(Song, Song.id == cls.id)
+            .order_by(cls.count.desc(), cls.id)
+            .limit(limit)
+        )
         result = await session.execute(stmt)
-        playcount = result.scalar_one_or_none()
+        return [tuple(row) for row in result]
+
+    @classmethod
+    async def bulk_increment(
+        cls,
+        session: AsyncSession,
+        deltas: Mapping[str, int],
+        *,
+        at: datetime | None = None,
+        batch_size: int | None = None,
+    ) -> dict[str, int]:
+        """Add ``deltas`` to the stored counts and return the new totals.
+
+        The upsert is split into statements of ``batch_size`` songs, all in
+        one transaction, so a backlog left by failed flushes stays within the
+        driver's bind parameter limit. With ``at``, the plays are also added
+        to the hourly and daily ``PlayBucket`` rows containing it.
+        """
+
+        if not deltas:
+            return {}
+        batch_size = batch_size or settings.PLAYCOUNT_UPSERT_BATCH_SIZE
+
+        # plays of songs deleted since they were recorded would violate the
+        # foreign key and fail the whole batch; a stable row order keeps
+        # concurrent flushes from deadlocking each other
+        requested = sorted(deltas)
+        known: list[str] = []
+        for start in range(0, len(requested), batch_size):
+            result = await session.execute(
+                select(Song.id).where(Song.id.in_(requested[start:start + batch_size]))
+            )
+            known.extend(result.scalars())
+        if not known:
+            await session.rollback()
+            return {}
+        known.sort()
+
+        insert = dialect_insert(session)
+        counts: dict[str, int] = {}
+        try:
+            for start in range(0, len(known), batch_size):
+                batch = {key: deltas[key] for key in known[start:start + batch_size]}
+                stmt = insert(cls).values([{"id": key, "count": delta} for key, delta in batch.items()])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[cls.id],
+                    set_={"count": cls.count + stmt.excluded.count},
+                ).returning(cls.id, cls.count)
+                result = await session.execute(stmt)
+                counts.update((row.id, row.count) for row in result)
+                if at is not None:
+                    await PlayBucket.add_plays(session, batch, at)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return counts
+
+
+# bucket period -> bucket length
+BUCKET_PERIODS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def bucket_start(at: datetime, period: str) -> datetime:
+    """Return the naive UTC start of the ``period`` bucket containing ``at``."""
+
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    start = at.replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        start = start.replace(hour=0)
+    return start
+
+
+def history_retention() -> dict[str, timedelta]:
+    """How long buckets of each period are kept."""
+
+    return {
+        "hour": timedelta(hours=settings.PLAY_HISTORY_HOURLY_RETENTION_HOURS),
+        "day": timedelta(days=settings.PLAY_HISTORY_DAILY_RETENTION_DAYS),
+    }
 
-        if playcount is None:
-            playcount = cls(id=playcount_id, count=1)
-            session.add(playcount)
-        else:
-            playcount.count += 1
-            session.add(playcount)
 
-        current_count = playcount.count
+class PlayBucket(Base):
+    """Plays of a song within one UTC hour or day.
 
-        await session.commit()
+    Buckets are upserted alongside ``play_counts`` on every flush, so recent
+    activity is summed from at most a few dozen rows per song instead of
+    individual play events. ``prune`` drops buckets past their retention.
+    """
 
-        STREAMS_BY_CLIP.labels(song_id=playcount_id, title=song_title).set(
-            current_count
+    __tablename__ = "play_buckets"
+    # trending queries scan one period over a time range
+    __table_args__ = (Index("ix_play_buckets_period_start", "period", "start"),)
+
+    song_id: Mapped[str] = mapped_column(
+        String,
+        ForeignKey("songs.id", name="fk_play_buckets_song_id_songs", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    period: Mapped[str] = mapped_column(String(8), primary_key=True)
+    start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    @classmethod
+    async def add_plays(
+        cls, session: AsyncSession, deltas: Mapping[str, int], at: datetime
+    ) -> None:
+        """Add ``deltas`` to the buckets containing ``at``; the caller commits."""
+
+        if not deltas:
+            return
+        insert = dialect_insert(session)
+        stmt = insert(cls).values(
+            [
+                {"song_id": key, "period": period, "start": bucket_start(at, period), "count": deltas[key]}
+                for period in BUCKET_PERIODS
+                for key in sorted(deltas)
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.song_id, cls.period, cls.start],
+            set_={"count": cls.count + stmt.excluded.count},
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    def period_for(window: timedelta) -> str:
+        """Pick the finest period whose retention covers ``window``.
+
+        Raises ``ValueError`` when no period keeps buckets that far back.
+        """
+
+        for period, retention in history_retention().items():
+            if window <= retention:
+                return period
+        raise ValueError(f"Play history is only kept for {history_retention()['day'].days} days")
+
+    @classmethod
+    async def trending(
+        cls,
+        session: AsyncSession,
+        *,
+        window: timedelta,
+        limit: int,
+        now: datetime | None = None,
+    ) -> list[tuple[str, str, int]]:
+        """Return ``(song_id, title, plays)`` for the most played songs within ``window``.
+
+        The window is widened to whole buckets, so it may include up to one
+        bucket of older plays. The sum only touches buckets in the window and
+        the database keeps just the top ``limit`` while ordering them.
+        """
+
+        period = cls.period_for(window)
+        since = bucket_start((now or datetime.now(timezone.utc)) - window, period)
+        plays = func.sum(cls.count).label("plays")
+        stmt = (
+            select(cls.song_id, Song.title, plays)
+            .join(Song, Song.id == cls.song_id)
+            .where(cls.period == period, cls.start >= since)
+            .group_by(cls.song_id, Song.title)
+            .order_by(plays.desc(), cls.song_id)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result]
+
+    @classmethod
+    async def prune(cls, session: AsyncSession, *, now: datetime | None = None) -> int:
+        """Delete buckets older than their period's retention and return how many."""
+
+        now = now or datetime.now(timezone.utc)
+        stmt = delete(cls).where(
+            or_(
+                *(
+                    (cls.period == period) & (cls.start < bucket_start(now, period) - retention)
+                    for period, retention in history_retention().items()
+                )
+            )
         )
+        try:
+            result = await session.execute(stmt)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return result.rowcount
 
 
 # FASTAPI VIEWS
@@ -61,3 +275,22 @@ class PlayCountBase(BaseModel):
 class PlayCountRead(PlayCountBase):
     id: str
     model_config = ConfigDict(from_attributes=True)
+
+
+class SongStatsRead(SongRead):
+    count: int
+
+
+class SongStatsQuery(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=settings.STATS_BATCH_MAX_IDS)
+
+
+class SongStatsBatch(BaseModel):
+    songs: list[SongStatsRead]
+    missing: list[str] = []
+
+
+class TrendingSong(BaseModel):
+    id: str
+    title: str
+    plays: int
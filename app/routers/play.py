@@ -1,49 +1,204 @@
+from datetime import timedelta
 from pathlib import Path
 import mimetypes
 import logging
+from typing import AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    Header,
+)
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.auth import require_api_key
+from app.core.auth import API_KEY_HEADER_NAME, require_api_key
 from app.core.db import get_db
+from app.core.playcounts import play_dedup, playcount_aggregator
 from app.core.config import settings
-from app.models.song import Song, SongCreateError
-from app.models.stats import PlayCount
+from app.core.bulk import BulkEntry, gather_bounded, store_archive_members
+from app.core.ingest import ingest_pipeline
+from app.models.song import (
+    ConflictMode,
+    Song,
+    SongBulkCreateResult,
+    SongCreateError,
+    SongImport,
+    SongRead,
+    SongStatus,
+    SongUploadResult,
+)
+from app.models.catalogue import catalogue_cache
+from app.models.stats import (
+    PlayBucket,
+    PlayCount,
+    SongStatsBatch,
+    SongStatsQuery,
+    SongStatsRead,
+    TrendingSong,
+)
 from app.core.media import (
+    AudioContentMismatchError,
+    AudioMetadata,
+    StoredAudio,
     extract_audio_metadata,
-    store_audio_file,
+    media_path_for_url,
+    media_url_for_path,
     UploadTooLargeError,
 )
+from app.core.multipart import (
+    MultipartError,
+    UnsupportedAudioTypeError,
+    receive_multipart_audio,
+)
+from app.core.uploads import (
+    UploadIncompleteError,
+    UploadOffsetMismatch,
+    UploadSession,
+    UploadSessionComplete,
+    UploadSessionCreate,
+    UploadSessionBusy,
+    UploadSessionNotFound,
+    UploadSessionRead,
+    append_upload_chunk,
+    create_upload_session,
+    discard_upload_session,
+    finalize_upload_session,
+    get_upload_session,
+)
+from app.core.pagination import InvalidCursorError, decode_cursor, encode_cursor
+from app.core.mediacache import media_cache
+from app.core.metrics import StreamObserver, observe_stage, route_template
+from app.core.streaming import (
+    file_validators,
+    http_date,
+    if_none_match_matches,
+    is_not_modified,
+    not_modified_response,
+    ranged_file_response,
+)
 
 router = APIRouter(
     prefix="/play",
     tags=["play"],
 )
 ALLOWED_AUDIO_TYPES = {mime.lower() for mime in settings.ALLOWED_AUDIO_MIME_TYPES}
+ARCHIVE_TYPES = {"application/zip", "application/x-zip-compressed"}
 logger = logging.getLogger(__name__)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 
-@router.get("/")
+_SONG_PAGE = TypeAdapter(list[SongRead])
+
+
+@router.get("/", response_model=list[SongRead])
 async def list_songs(
+    request: Request,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    cursor: str | None = None,
+    title_prefix: str | None = None,
+    min_duration: int | None = Query(None, ge=0),
+    max_duration: int | None = Query(None, ge=0),
     db: AsyncSession = Depends(get_db),
     _=Depends(require_api_key),
 ):
-    songs = await Song.list_all(db)
-    return songs
+    """A page of the catalogue, encoded once per catalogue version.
+
+    The ETag names the catalogue version and the page, so a matching
+    ``If-None-Match`` is answered with 304 before any query runs.
+    """
 
+    after = None
+    if cursor:
+        try:
+            title, song_id = decode_cursor(cursor, 2)
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        after = (str(title), str(song_id))
 
-@router.get("/{song_id}/stats")
+    page_key = (limit, cursor, title_prefix, min_duration, max_duration)
+    version = await catalogue_cache.version(db)
+    etag = catalogue_cache.etag(version, page_key)
+    if if_none_match_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    hit, page = catalogue_cache.pages.get((version, *page_key))
+    if hit and page is not None:
+        body, next_cursor = page
+    else:
+        songs = await Song.list_page(
+            db,
+            limit=limit + 1,
+            after=after,
+            title_prefix=title_prefix,
+            min_duration=min_duration,
+            max_duration=max_duration,
+        )
+        next_cursor = None
+        if len(songs) > limit:
+            songs = songs[:limit]
+            last = songs[-1]
+            next_cursor = encode_cursor(last.title, last.id)
+        body = _SONG_PAGE.dump_json(_SONG_PAGE.validate_python(songs, from_attributes=True))
+        catalogue_cache.pages.set((version, *page_key), (body, next_cursor))
+
+    headers = {"ETag": etag}
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@router.post("/stats", response_model=SongStatsBatch)
+async def get_songs_stats(
+    query: SongStatsQuery,
+    db: AsyncSession = Depends(get_db),
+    _=Depends(require_api_key),
+):
+    """Play counts and metadata for many songs, read with a single join."""
+
+    song_ids = list(dict.fromkeys(query.ids))
+    stats = await PlayCount.stats_for(db, song_ids)
+    return SongStatsBatch(
+        songs=[stats[song_id] for song_id in song_ids if song_id in stats],
+        missing=[song_id for song_id in song_ids if song_id not in stats],
+    )
+
+
+@router.get("/{song_id}/stats", response_model=SongStatsRead)
 async def get_song_stats(
     song_id: str,
     db: AsyncSession = Depends(get_db),
     _=Depends(require_api_key),
 ):
-    await Song.get_by_id(db, song_id)
-    playcount = await PlayCount.get_by_id(db, song_id)
-    return playcount
+    return await PlayCount.stats_for_song(db, song_id)
+
+
+@router.get("/trending", response_model=list[TrendingSong])
+async def get_trending(
+    window: str = Query("24h", pattern=r"^[1-9][0-9]{0,4}[hd]$"),
+    limit: int = Query(settings.TRENDING_DEFAULT_LIMIT, ge=1, le=settings.TRENDING_MAX_LIMIT),
+    db: AsyncSession = Depends(get_db),
+    _=Depends(require_api_key),
+):
+    """The most played songs within ``window`` (e.g. ``1h``, ``24h``, ``7d``).
+
+    Summed from the hourly play history buckets while the window fits their
+    retention, from the daily ones beyond that.
+    """
+
+    amount, unit = int(window[:-1]), window[-1]
+    span = timedelta(hours=amount) if unit == "h" else timedelta(days=amount)
+    try:
+        rows = await PlayBucket.trending(db, window=span, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return [TrendingSong(id=song_id, title=title, plays=plays) for song_id, title, plays in rows]
 
 
 @router.post("/")
@@ -59,82 +214,692 @@ async def create_song(
     return song
 
 
-def _build_audio_url(filename: str) -> str:
-    return f"{settings.media_url_path}/{filename}"
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+_SONG_IMPORTS = TypeAdapter(list[SongImport])
 
+_BULK_CREATE_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {
+                "schema": {"type": "array", "items": SongImport.model_json_schema()}
+            },
+            "application/x-ndjson": {"schema": SongImport.model_json_schema()},
+        },
+    }
+}
 
-@router.post("/upload")
-async def upload_song(
-    file: UploadFile = File(...),
-    title: str | None = Form(None),
-    description: str | None = Form(None),
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in error['loc']) or 'body'}: {error['msg']}"
+        for error in exc.errors(include_url=False)
+    )
+
+
+async def _read_song_imports(request: Request) -> AsyncIterator[dict]:
+    """Yield validated rows from a JSON array or an NDJSON stream, one per song.
+
+    NDJSON bodies are parsed line by line as they arrive, so batches can be
+    inserted before the whole body has been received. A JSON array has to be
+    buffered whole, so it is capped at ``BULK_CREATE_MAX_MB``, as is any one
+    NDJSON line.
+    """
+
+    max_bytes = settings.bulk_create_max_bytes
+    too_large = HTTPException(
+        status_code=413, detail=f"Bulk create body exceeds {settings.BULK_CREATE_MAX_MB} MB"
+    )
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    seen: set[str] = set()
+    count = 0
+
+    def _row(song: SongImport) -> dict:
+        nonlocal count
+        count += 1
+        if count > settings.BULK_CREATE_MAX_SONGS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"At most {settings.BULK_CREATE_MAX_SONGS} songs may be created at once",
+            )
+        if song.id is not None:
+            if song.id in seen:
+                raise HTTPException(status_code=422, detail=f"Duplicate song id {song.id}")
+            seen.add(song.id)
+        return song.model_dump()
+
+    if media_type not in NDJSON_MEDIA_TYPES:
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise too_large
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > max_bytes:
+                raise too_large
+        try:
+            songs = _SONG_IMPORTS.validate_json(body)
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail=_describe(exc)) from exc
+        for song in songs:
+            yield _row(song)
+        return
+
+    buffer = b""
+    line_number = 0
+
+    def _parse(line: bytes) -> SongImport:
+        try:
+            return SongImport.model_validate_json(line)
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=422, detail=f"Line {line_number}: {_describe(exc)}"
+            ) from exc
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _row(_parse(line))
+        if len(buffer) > max_bytes:
+            raise too_large
+    if buffer.strip():
+        line_number += 1
+        yield _row(_parse(buffer))
+
+
+@router.post(
+    "/bulk",
+    status_code=201,
+    response_model=SongBulkCreateResult,
+    openapi_extra=_BULK_CREATE_SCHEMA,
+)
+async def bulk_create_songs(
+    request: Request,
+    on_conflict: ConflictMode = "error",
     db: AsyncSession = Depends(get_db),
     _=Depends(require_api_key),
 ):
-    content_type = (file.content_type or "").lower()
-    if content_type not in ALLOWED_AUDIO_TYPES:
-        raise HTTPException(status_code=415, detail="Unsupported audio content type")
+    """Create many metadata-only songs from a JSON array or NDJSON body.
+
+    Rows are inserted in batched multi-row statements inside one transaction,
+    so either every song is written or none is. Songs may carry their own
+    ``id``; ``on_conflict`` decides whether an existing id fails the request,
+    is skipped, or is updated in place.
+    """
+
+    requested: list[str] = []
+
+    async def _rows() -> AsyncIterator[dict]:
+        async for row in _read_song_imports(request):
+            if row["id"] is not None:
+                requested.append(row["id"])
+            yield row
 
     try:
-        saved_path = await store_audio_file(
-            file,
-            settings.media_path,
-            max_bytes=settings.max_upload_bytes,
-        )
-    except UploadTooLargeError as exc:
-        raise HTTPException(status_code=413, detail=str(exc)) from exc
+        with observe_stage(route_template(request.scope), "db_insert"):
+            ids = await Song.bulk_create(db, _rows(), on_conflict=on_conflict)
+    except SongCreateError as exc:
+        raise HTTPException(status_code=409, detail="Song already exists") from exc
+
+    written = set(ids)
+    return SongBulkCreateResult(
+        ids=ids, skipped=[song_id for song_id in requested if song_id not in written]
+    )
+
+
+def _build_audio_url(saved_path: Path) -> str:
+    return media_url_for_path(saved_path, settings.media_path, settings.media_url_path)
+
+
+async def _create_song_from_file(
+    db: AsyncSession,
+    stored: StoredAudio,
+    *,
+    filename: str | None,
+    title: str | None,
+    description: str | None,
+    route: str,
+) -> Song:
+    """Persist the song row for a stored file.
+
+    Metadata is extracted inline, or, in background ingest mode, the row is
+    created as pending and filled in by ``ingest_pipeline`` later.
+    """
+
+    saved_path = stored.path
+    existing = await Song.get_by_content_hash(db, stored.content_hash)
+    if existing is not None:
+        # drop the file only if this call created it and the row names another
+        if stored.created and existing.audio_url != _build_audio_url(saved_path):
+            saved_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail="Song already exists")
+
+    fallback_title = title or Path(filename or saved_path.name).stem
+    background = settings.INGEST_MODE == "background" and ingest_pipeline.has_capacity()
 
     try:
-        metadata = await run_in_threadpool(extract_audio_metadata, saved_path)
+        if background:
+            metadata = AudioMetadata()
+        else:
+            with observe_stage(route, "metadata"):
+                metadata = await run_in_threadpool(
+                    extract_audio_metadata, saved_path, stored.audio_format
+                )
 
-        inferred_title = (
-            metadata.title or title or Path(file.filename or saved_path.name).stem
-        )
+        inferred_title = metadata.title or fallback_title
         inferred_description = description or metadata.description
         duration = metadata.duration_seconds or 0
-        audio_url = _build_audio_url(saved_path.name)
+        audio_url = _build_audio_url(saved_path)
 
-        song = await Song.create(
-            db,
-            title=inferred_title,
-            description=inferred_description,
-            duration=duration,
-            audio_url=audio_url,
-        )
+        with observe_stage(route, "db_insert"):
+            song = await Song.create(
+                db,
+                title=inferred_title,
+                description=inferred_description,
+                duration=duration,
+                audio_url=audio_url,
+                content_hash=stored.content_hash,
+                size_bytes=stored.size_bytes,
+                status=SongStatus.PENDING if background else SongStatus.READY,
+                media_info=metadata.media_info(),
+            )
     except SongCreateError as exc:
-        saved_path.unlink(missing_ok=True)
+        # a concurrent upload of the same body won the race and owns the file
         logger.exception("Song persistence failed for %s", saved_path)
         raise HTTPException(status_code=409, detail="Song already exists") from exc
     except Exception as exc:  # pragma: no cover - safeguards tests
-        saved_path.unlink(missing_ok=True)
+        await _discard_unreferenced(db, [stored])
         logger.exception("Unhandled upload failure for %s", saved_path)
         raise HTTPException(
             status_code=500, detail="Failed to save song metadata"
         ) from exc
 
+    if background:
+        ingest_pipeline.submit(song.id, saved_path, description=description)
+    return song
+
+
+def _song_response(song: Song, response: Response) -> Song:
+    if song.status == SongStatus.PENDING:
+        response.status_code = 202
     return song
 
 
+_UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "title": {"type": "string"},
+                        "description": {"type": "string"},
+                    },
+                }
+            }
+        },
+    }
+}
+# room for the multipart framing and the small text fields next to the file
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _check_declared_upload_size(request: Request, max_bytes: int) -> None:
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(status_code=413, detail="Uploaded file exceeds allowed size")
+
+
+@router.post("/upload", openapi_extra=_UPLOAD_FORM_SCHEMA)
+async def upload_song(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    _=Depends(require_api_key),
+):
+    route = route_template(request.scope)
+    _check_declared_upload_size(
+        request, settings.max_upload_bytes + _MULTIPART_OVERHEAD_BYTES
+    )
+    try:
+        with observe_stage(route, "store"):
+            form = await receive_multipart_audio(
+                request.stream(),
+                request.headers.get("content-type", ""),
+                settings.media_path,
+                max_bytes=settings.max_upload_bytes,
+                allowed_types=ALLOWED_AUDIO_TYPES,
+            )
+    except (UnsupportedAudioTypeError, AudioContentMismatchError) as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from exc
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except MultipartError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    received = next((f for f in form.files if f.field_name == "file"), None)
+    if received is None:
+        for extra in form.files:
+            if extra.stored.created:
+                extra.stored.path.unlink(missing_ok=True)
+        raise HTTPException(status_code=422, detail="An audio file is required")
+
+    song = await _create_song_from_file(
+        db,
+        received.stored,
+        filename=received.filename,
+        title=form.fields.get("title") or None,
+        description=form.fields.get("description") or None,
+        route=route,
+    )
+    return _song_response(song, response)
+
+
+_BULK_UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "description": "Audio files and/or zip archives of audio files",
+                        },
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+async def _extract_bulk_metadata(entries: list[BulkEntry]) -> None:
+    async def _extract(entry: BulkEntry) -> None:
+        try:
+            entry.metadata = await ingest_pipeline.extract(
+                entry.stored.path, entry.stored.audio_format
+            )
+        except Exception:
+            logger.exception("Metadata extraction failed for %s", entry.stored.path)
+            entry.metadata = AudioMetadata()
+
+    await gather_bounded(_extract, entries, concurrency=settings.BULK_UPLOAD_CONCURRENCY)
+
+
+async def _ingest_bulk_entries(
+    db: AsyncSession, entries: list[BulkEntry], *, route: str
+) -> list[SongUploadResult]:
+    """Create song rows for every stored entry with a single multi-row insert."""
+
+    stored = [entry for entry in entries if entry.stored is not None]
+    existing = await Song.get_by_content_hashes(
+        db, {entry.stored.content_hash for entry in stored}
+    )
+
+    fresh: dict[str, BulkEntry] = {}
+    for entry in stored:
+        content_hash = entry.stored.content_hash
+        song = existing.get(content_hash)
+        if song is not None and entry.stored.created:
+            if song.audio_url != _build_audio_url(entry.stored.path):
+                entry.stored.path.unlink(missing_ok=True)
+        if song is None and content_hash not in fresh:
+            fresh[content_hash] = entry
+
+    with observe_stage(route, "metadata"):
+        await _extract_bulk_metadata(list(fresh.values()))
+
+    rows = []
+    for entry in fresh.values():
+        metadata = entry.metadata or AudioMetadata()
+        rows.append(
+            {
+                "title": metadata.title or Path(entry.filename or entry.stored.path.name).stem,
+                "description": metadata.description,
+                "duration": metadata.duration_seconds or 0,
+                "audio_url": _build_audio_url(entry.stored.path),
+                "content_hash": entry.stored.content_hash,
+                "size_bytes": entry.stored.size_bytes,
+                "status": SongStatus.READY,
+                **metadata.media_info(),
+            }
+        )
+    try:
+        with observe_stage(route, "db_insert"):
+            ids = await Song.bulk_create(db, rows)
+    except SongCreateError as exc:
+        # a concurrent upload claimed one of the bodies and nothing from this
+        # batch was kept; the caller removes the files no row points at
+        raise HTTPException(status_code=409, detail="Song already exists") from exc
+
+    songs = {
+        content_hash: SongRead.model_validate(song) for content_hash, song in existing.items()
+    }
+    for song_id, row in zip(ids, rows):
+        songs[row["content_hash"]] = SongRead(id=song_id, **row)
+
+    results = []
+    for entry in entries:
+        if entry.stored is None:
+            results.append(
+                SongUploadResult(filename=entry.filename, status="rejected", detail=entry.reason)
+            )
+        elif fresh.get(entry.stored.content_hash) is entry:
+            results.append(
+                SongUploadResult(
+                    filename=entry.filename,
+                    status="created",
+                    song=songs[entry.stored.content_hash],
+                )
+            )
+        else:
+            results.append(
+                SongUploadResult(
+                    filename=entry.filename,
+                    status="duplicate",
+                    detail="Song already exists",
+                    song=songs[entry.stored.content_hash],
+                )
+            )
+    return results
+
+
+@router.post(
+    "/upload/bulk",
+    response_model=list[SongUploadResult],
+    openapi_extra=_BULK_UPLOAD_FORM_SCHEMA,
+)
+async def bulk_upload_songs(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    _=Depends(require_api_key),
+):
+    """Ingest many audio files, or zip archives of them, in one request.
+
+    Files are stored as they stream in, archive members are unpacked and
+    metadata is extracted with bounded concurrency, and all new songs are
+    inserted in one transaction. Invalid files are reported per file rather
+    than failing the batch.
+    """
+
+    route = route_template(request.scope)
+    _check_declared_upload_size(
+        request, settings.bulk_upload_max_bytes + _MULTIPART_OVERHEAD_BYTES
+    )
+    try:
+        with observe_stage(route, "store"):
+            form = await receive_multipart_audio(
+                request.stream(),
+                request.headers.get("content-type", ""),
+                settings.media_path,
+                max_bytes=settings.max_upload_bytes,
+                allowed_types=ALLOWED_AUDIO_TYPES,
+                max_files=settings.BULK_UPLOAD_MAX_FILES,
+                reject_invalid=True,
+                archive_types=ARCHIVE_TYPES,
+                max_archive_bytes=settings.bulk_upload_max_bytes,
+            )
+    except MultipartError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    entries = [BulkEntry(received.filename, stored=received.stored) for received in form.files]
+    try:
+        for archive in form.archives:
+            with observe_stage(route, "unpack"):
+                entries.extend(
+                    await store_archive_members(
+                        archive.path,
+                        settings.media_path,
+                        max_bytes=settings.max_upload_bytes,
+                        allowed_types=ALLOWED_AUDIO_TYPES,
+                        max_members=max(settings.BULK_UPLOAD_MAX_FILES - len(entries), 0),
+                        concurrency=settings.BULK_UPLOAD_CONCURRENCY,
+                    )
+                )
+            archive.path.unlink(missing_ok=True)
+        entries.extend(
+            BulkEntry(rejected.filename, reason=rejected.reason) for rejected in form.rejected
+        )
+        if not entries:
+            raise HTTPException(status_code=422, detail="At least one audio file is required")
+        return await _ingest_bulk_entries(db, entries, route=route)
+    except Exception:
+        for archive in form.archives:
+            archive.path.unlink(missing_ok=True)
+        await _discard_unreferenced(db, [entry.stored for entry in entries if entry.stored is not None])
+        raise
+
+
+async def _discard_unreferenced(db: AsyncSession, stored: list[StoredAudio]) -> None:
+    """Remove files this request created unless a committed row points at them.
+
+    Rows may have been committed before the failure, by this request or by a
+    concurrent one storing the same body. When that cannot be checked the
+    files are kept: an orphan is cheaper than a song without its audio.
+    """
+
+    created = [item for item in stored if item.created]
+    if not created:
+        return
+    try:
+        await db.rollback()
+        songs = await Song.get_by_content_hashes(db, {item.content_hash for item in created})
+    except Exception:
+        logger.exception("Could not check which stored files are referenced, keeping them")
+        return
+    for item in created:
+        song = songs.get(item.content_hash)
+        if song is None or song.audio_url != _build_audio_url(item.path):
+            item.path.unlink(missing_ok=True)
+
+
+UPLOAD_OFFSET_HEADER = "Upload-Offset"
+
+
+def _upload_session_response(session: UploadSession, status_code: int = 200) -> JSONResponse:
+    return JSONResponse(
+        UploadSessionRead.model_validate(session).model_dump(),
+        status_code=status_code,
+        headers={UPLOAD_OFFSET_HEADER: str(session.offset)},
+    )
+
+
+@router.post("/uploads", status_code=201, response_model=UploadSessionRead)
+async def create_upload(
+    payload: UploadSessionCreate,
+    _=Depends(require_api_key),
+):
+    if payload.content_type.lower() not in ALLOWED_AUDIO_TYPES:
+        raise HTTPException(status_code=415, detail="Unsupported audio content type")
+    try:
+        session = create_upload_session(
+            settings.media_path,
+            filename=payload.filename,
+            content_type=payload.content_type.lower(),
+            length=payload.length,
+            max_bytes=settings.max_upload_bytes,
+        )
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    return _upload_session_response(session, status_code=201)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionRead)
+async def get_upload(upload_id: str, _=Depends(require_api_key)):
+    try:
+        session = get_upload_session(settings.media_path, upload_id)
+    except UploadSessionNotFound as exc:
+        raise HTTPException(status_code=404, detail="Upload session not found") from exc
+    return _upload_session_response(session)
+
+
+@router.patch("/uploads/{upload_id}", response_model=UploadSessionRead)
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias=UPLOAD_OFFSET_HEADER, ge=0),
+    _=Depends(require_api_key),
+):
+    try:
+        with observe_stage(route_template(request.scope), "store"):
+            session = await append_upload_chunk(
+                settings.media_path,
+                upload_id,
+                upload_offset,
+                request.stream(),
+                max_bytes=settings.max_upload_bytes,
+            )
+    except UploadSessionNotFound as exc:
+        raise HTTPException(status_code=404, detail="Upload session not found") from exc
+    except UploadSessionBusy as exc:
+        raise HTTPException(status_code=409, detail="Upload session is busy") from exc
+    except UploadOffsetMismatch as exc:
+        return JSONResponse(
+            {"detail": str(exc)},
+            status_code=409,
+            headers={UPLOAD_OFFSET_HEADER: str(exc.offset)},
+        )
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except AudioContentMismatchError as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from exc
+    return _upload_session_response(session)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    payload: UploadSessionComplete | None = None,
+    db: AsyncSession = Depends(get_db),
+    _=Depends(require_api_key),
+):
+    payload = payload or UploadSessionComplete()
+    route = route_template(request.scope)
+    try:
+        session = get_upload_session(settings.media_path, upload_id)
+        with observe_stage(route, "store"):
+            stored = await finalize_upload_session(settings.media_path, upload_id)
+    except UploadSessionNotFound as exc:
+        raise HTTPException(status_code=404, detail="Upload session not found") from exc
+    except UploadSessionBusy as exc:
+        raise HTTPException(status_code=409, detail="Upload session is busy") from exc
+    except UploadIncompleteError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except AudioContentMismatchError as exc:
+        raise HTTPException(status_code=415, detail=str(exc)) from exc
+
+    song = await _create_song_from_file(
+        db,
+        stored,
+        filename=session.filename,
+        title=payload.title,
+        description=payload.description,
+        route=route,
+    )
+    return _song_response(song, response)
+
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def abort_upload(upload_id: str, _=Depends(require_api_key)):
+    try:
+        discard_upload_session(settings.media_path, upload_id)
+    except UploadSessionNotFound as exc:
+        raise HTTPException(status_code=404, detail="Upload session not found") from exc
+    except UploadSessionBusy as exc:
+        raise HTTPException(status_code=409, detail="Upload session is busy") from exc
+
+
+@router.get("/{song_id}", response_model=SongRead)
+async def get_song(
+    song_id: str,
+    db: AsyncSession = Depends(get_db),
+    _=Depends(require_api_key),
+):
+    return await Song.get_by_id(db, song_id)
+
+
+def _listener_identity(request: Request) -> str:
+    """An explicit client id header if sent, else the API key and client address."""
+
+    client_id = request.headers.get(settings.PLAY_DEDUP_CLIENT_HEADER)
+    if client_id:
+        return f"id:{client_id}"
+    host = request.client.host if request.client else ""
+    return f"addr:{host}|{request.headers.get(API_KEY_HEADER_NAME, '')}"
+
+
 @router.get("/{song_id}/stream")
-async def stream_song(song_id: str, db: AsyncSession = Depends(get_db)):
-    song = await Song.get_by_id(db, song_id)
-    file_path = settings.media_path / Path(song.audio_url).name
+async def stream_song(
+    song_id: str,
+    request: Request,
+    # "function" scope closes the session as soon as this handler returns, so
+    # the pooled connection is not held for the lifetime of the audio stream.
+    db: AsyncSession = Depends(get_db, scope="function"),
+):
+    route = route_template(request.scope)
+    observer = StreamObserver(route)
+    with observe_stage(route, "db_lookup"):
+        song = await Song.get_cached(db, song_id)
+    try:
+        file_path = media_path_for_url(
+            song.audio_url, settings.media_path, settings.media_url_path
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail="Audio file not found") from exc
     song_title = song.title
 
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Audio file not found")
+    if song.size_bytes is not None and song.mime_type and song.content_hash:
+        # everything the headers need was recorded at upload, so no stat; a
+        # file missing on disk is answered with 404 when it is opened
+        size, media_type = song.size_bytes, song.mime_type
+        etag = f'"{song.content_hash}"'
+        last_modified = http_date(song.created_at) if song.created_at else None
+        version: object = song.content_hash
+    else:
+        try:
+            with observe_stage(route, "file_stat"):
+                stat_result = file_path.stat()
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=404, detail="Audio file not found") from exc
+        size = stat_result.st_size
+        media_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+        etag, last_modified = file_validators(stat_result)
+        version = (stat_result.st_mtime_ns, size)
 
-    await PlayCount.increment_count(db, song_id, song_title)
-    #
+    if is_not_modified(request.headers, etag, last_modified):
+        # the client already has this track; a revalidation is not a play
+        return not_modified_response(etag, last_modified, settings.STREAM_CACHE_CONTROL)
 
-    media_type, _ = mimetypes.guess_type(file_path.name)
+    listener = _listener_identity(request)
 
-    def iterfile():
-        with file_path.open("rb") as f:
-            while chunk := f.read(1024 * 1024):
-                yield chunk
+    def record_play() -> None:
+        # only once the file is there, so a missing file is not a play
+        with observe_stage(route, "playcount"):
+            if play_dedup.admit(listener, song_id):
+                playcount_aggregator.record(song_id, song_title)
 
-    return StreamingResponse(
-        iterfile(),
-        media_type=media_type or "music/mpeg",
+    return ranged_file_response(
+        file_path,
+        media_type,
+        request.headers,
+        size=size,
+        etag=etag,
+        last_modified=last_modified,
+        cache_control=settings.STREAM_CACHE_CONTROL,
+        chunk_size=settings.stream_chunk_bytes,
+        zero_copy=settings.STREAM_ZERO_COPY,
+        observer=observer,
+        buffer=media_cache.get(file_path, size, version),
+        on_open=record_play,
     )
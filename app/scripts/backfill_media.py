@@ -0,0 +1,118 @@
+"""Fill in size, hash and stream format for songs stored before they were recorded.
+
+    python -m app.scripts.backfill_media --batch-size 200
+    python -m app.scripts.backfill_media --dry-run
+
+Songs are visited in id order, so an interrupted run can simply be restarted.
+Files that are missing on disk are reported and left untouched.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import mimetypes
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.db import sessionmanager
+from app.core.ingest import SessionFactory
+from app.core.media import extract_audio_metadata, hash_file, media_path_for_url
+from app.models.song import Song
+
+logger = logging.getLogger("mosic.backfill")
+
+
+def describe_file(song: Song) -> dict[str, Any] | None:
+    """Return the columns to update for ``song``, or ``None`` if its file is missing."""
+
+    try:
+        file_path = media_path_for_url(song.audio_url, settings.media_path, settings.media_url_path)
+    except ValueError:
+        return None
+    if not file_path.is_file():
+        return None
+
+    values: dict[str, Any] = {"id": song.id}
+    if song.content_hash is None:
+        values["content_hash"], values["size_bytes"] = hash_file(file_path)
+    elif song.size_bytes is None:
+        values["size_bytes"] = file_path.stat().st_size
+
+    if song.mime_type is None:
+        media_info = extract_audio_metadata(file_path).media_info()
+        if media_info["mime_type"] is None:
+            media_info["mime_type"] = mimetypes.guess_type(file_path.name)[0]
+        values.update({key: value for key, value in media_info.items() if value is not None})
+    return values
+
+
+async def backfill(
+    *,
+    batch_size: int,
+    dry_run: bool = False,
+    session_factory: SessionFactory | None = None,
+) -> tuple[int, int]:
+    """Backfill every song missing media info; returns (updated, missing) counts."""
+
+    updated = missing = 0
+    after: str | None = None
+    async with (session_factory or sessionmanager.session)() as session:
+        while True:
+            songs = await Song.list_missing_media_info(session, limit=batch_size, after=after)
+            if not songs:
+                break
+            after = songs[-1].id
+
+            updates = []
+            for song in songs:
+                values = await run_in_threadpool(describe_file, song)
+                if values is None:
+                    missing += 1
+                    logger.warning("Audio file for song %s (%s) is missing", song.id, song.audio_url)
+                    continue
+                updates.append(values)
+
+            # the hash is unique: a duplicate upload of the same bytes keeps its
+            # size and format but cannot take over the hash
+            hashes = [values["content_hash"] for values in updates if "content_hash" in values]
+            taken = set(await Song.get_by_content_hashes(session, hashes))
+            seen: set[str] = set()
+            for values in updates:
+                content_hash = values.get("content_hash")
+                if content_hash is not None and (content_hash in taken or content_hash in seen):
+                    del values["content_hash"]
+                elif content_hash is not None:
+                    seen.add(content_hash)
+            updates = [values for values in updates if len(values) > 1]
+
+            updated += len(updates)
+            if not dry_run:
+                await Song.update_media_info(session, updates)
+            # the rows are refetched by the next page query
+            session.expunge_all()
+            logger.info("Backfilled %d songs so far (%d missing files)", updated, missing)
+    return updated, missing
+
+
+async def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    sessionmanager.init(settings.database_url)
+    try:
+        updated, missing = await backfill(batch_size=args.batch_size, dry_run=args.dry_run)
+    finally:
+        await sessionmanager.close()
+    verb = "Would update" if args.dry_run else "Updated"
+    print(f"{verb} {updated} songs; {missing} audio files missing")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Compare two ``benchmarks.run`` result files and flag regressions.
+
+    python -m benchmarks.compare base.json head.json --threshold 0.10
+
+Exits with status 1 when any scenario's throughput drops, or its p95/p99
+latency grows, by more than ``--threshold`` (a fraction of the baseline).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import sys
+
+# (label, path into a scenario summary, whether higher is better)
+METRICS = (
+    ("req/s", ("requests_per_s",), True),
+    ("MB/s", ("mb_per_s",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+)
+# MB/s follows req/s and p50 is noisy, so only these gate the exit status
+GATED = {"req/s", "p95 ms", "p99 ms"}
+
+
+def _value(summary: dict, path: tuple[str, ...]) -> float:
+    for key in path:
+        summary = summary[key]
+    return float(summary)
+
+
+def compare(base: dict, head: dict, threshold: float) -> tuple[list[str], list[str]]:
+    """Return report lines and the regressions found between two result files."""
+
+    lines = [f"{'scenario':<14}{'metric':<8}{'base':>12}{'head':>12}{'change':>10}"]
+    regressions = []
+    for name, head_summary in head["scenarios"].items():
+        base_summary = base["scenarios"].get(name)
+        if base_summary is None:
+            continue
+        for label, path, higher_is_better in METRICS:
+            before, after = _value(base_summary, path), _value(head_summary, path)
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if label in GATED and worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {label}: {before:g} -> {after:g} ({change:+.1%})")
+            lines.append(f"{name:<14}{label:<8}{before:>12.2f}{after:>12.2f}{change:>+10.1%}{flag}")
+        if head_summary["errors"] > base_summary["errors"]:
+            regressions.append(
+                f"{name} errors: {base_summary['errors']} -> {head_summary['errors']}"
+            )
+    return lines, regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", type=Path)
+    parser.add_argument("head", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    base = json.loads(args.base.read_text())
+    head = json.loads(args.head.read_text())
+    lines, regressions = compare(base, head, args.threshold)
+    print(f"base {base['meta'].get('commit')}  head {head['meta'].get('commit')}")
+    print("\n".join(lines))
+    if regressions:
+        print("\nRegressions:")
+        print("\n".join(f"  {line}" for line in regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Generated audio fixtures and catalogue seeding for the benchmarks."""
+
+from __future__ import annotations
+
+from array import array
+import hashlib
+import io
+import math
+from pathlib import Path
+import random
+import wave
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.db import Base
+from app.core.media import content_addressed_path, media_url_for_path
+from app.models.song import Song, SongStatus
+import app.models.stats  # noqa: F401  (registers play_counts for create_all)
+
+SAMPLE_RATE = 22_050
+
+
+def make_wav(seconds: float, *, frequency: float, seed: int = 0) -> bytes:
+    """Render a mono 16-bit sine tone; ``seed`` makes otherwise equal tones distinct."""
+
+    frames = int(SAMPLE_RATE * seconds)
+    step = 2 * math.pi * frequency / SAMPLE_RATE
+    samples = array("h", (int(12_000 * math.sin(step * i)) for i in range(frames)))
+    if frames:
+        samples[0] = seed % 32_768
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+async def seed_catalogue(
+    database_url: str,
+    media_root: Path,
+    *,
+    songs: int,
+    min_seconds: float,
+    max_seconds: float,
+    url_prefix: str = "/media",
+    rng: random.Random,
+) -> list[tuple[str, int]]:
+    """Write ``songs`` WAV files into content-addressed storage and insert their rows.
+
+    Returns ``(song_id, size_bytes)`` pairs for the seeded songs.
+    """
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    rows = []
+    for index in range(songs):
+        body = make_wav(
+            rng.uniform(min_seconds, max_seconds),
+            frequency=rng.uniform(110, 880),
+            seed=index,
+        )
+        content_hash = hashlib.sha256(body).hexdigest()
+        path = content_addressed_path(media_root, content_hash, ".wav")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        rows.append(
+            {
+                "title": f"Benchmark {index:05d}",
+                "description": None,
+                "duration": round(len(body) / (SAMPLE_RATE * 2)),
+                "audio_url": media_url_for_path(path, media_root, url_prefix),
+                "content_hash": content_hash,
+                "size_bytes": len(body),
+                "mime_type": "audio/wav",
+                "codec": "pcm",
+                "bitrate": SAMPLE_RATE * 16,
+                "sample_rate": SAMPLE_RATE,
+                "status": SongStatus.READY,
+            }
+        )
+
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            # re-seeding an existing database keeps the rows already there
+            await Song.bulk_create(session, rows, on_conflict="ignore")
+            seeded = await Song.get_by_content_hashes(
+                session, [row["content_hash"] for row in rows]
+            )
+    finally:
+        await engine.dispose()
+    return [(song.id, song.size_bytes or 0) for song in seeded.values()]
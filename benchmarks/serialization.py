@@ -0,0 +1,120 @@
+"""Per-row cost of serializing a catalogue page, ORM path versus column path.
+
+    python -m benchmarks.serialization --sizes 10000 100000 --repeat 5
+
+``orm`` is what ``GET /play/`` did without a response model: load ``Song``
+instances into the session and run ``jsonable_encoder`` plus ``json.dumps``
+over them. ``columns`` is the current path: select only the ``SongRead``
+columns and let pydantic validate the rows and write the JSON bytes in one go.
+Both include the query, since building ORM instances is part of the cost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base
+from app.models.song import Song, SongRead, SongStatus
+import app.models.stats  # noqa: F401  (registers play_counts for create_all)
+
+_PAGE = TypeAdapter(list[SongRead])
+
+
+async def orm_path(session: AsyncSession) -> bytes:
+    songs = (await session.execute(select(Song).order_by(Song.title, Song.id))).scalars().all()
+    body = json.dumps(jsonable_encoder(list(songs))).encode()
+    session.expunge_all()
+    return body
+
+
+async def columns_path(session: AsyncSession) -> bytes:
+    stmt = select(*Song.read_columns()).order_by(Song.title, Song.id)
+    rows = (await session.execute(stmt)).all()
+    return _PAGE.dump_json(_PAGE.validate_python(rows, from_attributes=True))
+
+
+PATHS: dict[str, Callable[[AsyncSession], Awaitable[bytes]]] = {
+    "orm": orm_path,
+    "columns": columns_path,
+}
+
+
+async def _seed(session: AsyncSession, count: int) -> None:
+    await Song.bulk_create(
+        session,
+        (
+            {
+                "title": f"Benchmark {index:06d}",
+                "description": "generated" if index % 3 else None,
+                "duration": 60 + index % 240,
+                "audio_url": f"/media/{index:06d}.mp3",
+                "content_hash": f"{index:064x}",
+                "size_bytes": 3_000_000 + index,
+                "mime_type": "audio/mpeg",
+                "codec": "mp3",
+                "bitrate": 192_000,
+                "sample_rate": 44_100,
+                "status": SongStatus.READY,
+            }
+            for index in range(count)
+        ),
+    )
+
+
+async def measure(count: int, repeat: int) -> dict[str, float]:
+    """Return the median microseconds per row of each path for ``count`` songs."""
+
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            await _seed(session, count)
+            bodies = {name: await path(session) for name, path in PATHS.items()}
+            if json.loads(bodies["orm"]) != json.loads(bodies["columns"]):
+                raise AssertionError("the two paths produced different documents")
+
+            results = {}
+            for name, path in PATHS.items():
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    await path(session)
+                    timings.append(time.perf_counter() - start)
+                results[name] = statistics.median(timings) / count * 1e6
+            return results
+    finally:
+        await engine.dispose()
+
+
+async def run(sizes: list[int], repeat: int) -> None:
+    print(f"{'songs':>8}{'orm us/row':>14}{'columns us/row':>16}{'speedup':>10}")
+    for count in sizes:
+        result = await measure(count, repeat)
+        speedup = result["orm"] / result["columns"]
+        print(f"{count:>8}{result['orm']:>14.2f}{result['columns']:>16.2f}{speedup:>9.1f}x")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,12 @@ from starlette.routing import Mount
 from app.core.auth import API_KEY_HEADER_NAME
 from app.core.config import settings
 from app.core.db import Base, get_db, sessionmanager
+from app.core.ingest import ingest_pipeline
+from app.core.playcounts import play_dedup, playcount_aggregator
 from app.main import app as fastapi_app
 
-import app.models.song  # noqa: F401
+from app.models.catalogue import catalogue_cache
+from app.models.song import song_cache
 import app.models.stats  # noqa: F401
 
 
@@ -49,6 +52,7 @@ def _update_media_mount(fastapi_app: FastAPI, directory: Path) -> None:
     for route in fastapi_app.routes:
         if isinstance(route, Mount) and route.name == "media":
             route.app.directory = str(directory)
+            route.app.all_directories = [str(directory)]
             return
 
 
@@ -70,6 +74,14 @@ async def client(
             yield session
 
     fastapi_app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(playcount_aggregator, "_session_factory", session_factory)
+    monkeypatch.setattr(ingest_pipeline, "_session_factory", session_factory)
+    song_cache.clear()
+    play_dedup.clear()
+    catalogue_cache.invalidate()
+    monkeypatch.setattr(playcount_aggregator, "_pending", {})
+    monkeypatch.setattr(playcount_aggregator, "_titles", {})
+    monkeypatch.setattr(playcount_aggregator, "_pending_plays", 0)
 
     original_media_root = settings.MEDIA_ROOT
     original_media_path = settings.media_path
@@ -90,6 +102,7 @@ async def client(
     ) as test_client:
         yield test_client
 
+    await ingest_pipeline.close()
     fastapi_app.dependency_overrides.pop(get_db, None)
     settings.MEDIA_ROOT = original_media_root
     _update_media_mount(fastapi_app, original_media_path)
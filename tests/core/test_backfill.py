@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import hashlib
+
+import pytest
+
+from app.core.config import settings
+from app.models.song import Song
+from app.scripts.backfill_media import backfill
+
+
+@pytest.fixture()
+def media_root(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "MEDIA_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def _song(song_id: str, name: str, **values) -> Song:
+    return Song(
+        id=song_id,
+        title=song_id,
+        duration=1,
+        audio_url=f"{settings.media_url_path}/{name}",
+        **values,
+    )
+
+
+@pytest.mark.anyio
+async def test_backfill_fills_size_hash_and_format(session_factory, media_root):
+    body = b"ID3 legacy upload"
+    (media_root / "legacy.mp3").write_bytes(body)
+    (media_root / "copy.mp3").write_bytes(body)
+    async with session_factory() as session:
+        session.add_all(
+            [
+                _song("a-legacy", "legacy.mp3"),
+                _song("b-copy", "copy.mp3"),
+                _song("c-missing", "missing.mp3"),
+            ]
+        )
+        await session.commit()
+
+    updated, missing = await backfill(batch_size=2, session_factory=session_factory)
+
+    assert (updated, missing) == (2, 1)
+    async with session_factory() as session:
+        legacy = await Song.get_by_id(session, "a-legacy")
+        copy = await Song.get_by_id(session, "b-copy")
+        untouched = await Song.get_by_id(session, "c-missing")
+    assert legacy.content_hash == hashlib.sha256(body).hexdigest()
+    assert legacy.size_bytes == len(body)
+    assert legacy.mime_type == "audio/mpeg"
+    # the hash is unique, so the duplicate only gets its size and format
+    assert copy.content_hash is None
+    assert copy.size_bytes == len(body)
+    assert copy.mime_type == "audio/mpeg"
+    assert untouched.size_bytes is None
+
+
+@pytest.mark.anyio
+async def test_backfill_dry_run_writes_nothing(session_factory, media_root):
+    (media_root / "legacy.mp3").write_bytes(b"ID3 legacy upload")
+    async with session_factory() as session:
+        session.add(_song("legacy", "legacy.mp3"))
+        await session.commit()
+
+    assert await backfill(batch_size=10, dry_run=True, session_factory=session_factory) == (1, 0)
+    async with session_factory() as session:
+        assert (await Song.get_by_id(session, "legacy")).size_bytes is None
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import TTLCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    fake = _Clock()
+    monkeypatch.setattr(cache_module, "time", fake)
+    return fake
+
+
+def test_evicts_least_recently_used_entry(clock):
+    cache: TTLCache[str, int] = TTLCache("test", max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache: TTLCache[str, int] = TTLCache("test", max_entries=10, ttl=60, negative_ttl=5)
+    cache.set("positive", 1)
+    cache.set("negative", None)
+    assert cache.get("negative") == (True, None)
+
+    clock.now += 10
+    assert cache.get("negative") == (False, None)
+    assert cache.get("positive") == (True, 1)
+
+    clock.now += 60
+    assert cache.get("positive") == (False, None)
+    assert len(cache) == 0
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+
+from app.core.leaderboard import StreamLeaderboard
+from app.core.playcounts import PlayCountAggregator
+from app.models.song import Song
+from app.models.stats import PlayCount
+
+
+def test_keeps_only_the_hottest_songs():
+    leaderboard = StreamLeaderboard(capacity=2)
+    leaderboard.update("a", "A", 5)
+    leaderboard.update("b", "B", 1)
+    leaderboard.update("c", "C", 3)
+    leaderboard.update("d", "D", 2)
+
+    assert leaderboard.top() == [("a", "A", 5), ("c", "C", 3)]
+
+    leaderboard.update("b", "B", 9)
+    assert leaderboard.top() == [("b", "B", 9), ("a", "A", 5)]
+
+
+def test_renamed_song_does_not_leave_a_stale_series():
+    leaderboard = StreamLeaderboard(capacity=10)
+    registry = CollectorRegistry()
+    registry.register(leaderboard)
+
+    leaderboard.update("a", "Old title", 1)
+    leaderboard.update("a", "New title", 2)
+
+    exposition = generate_latest(registry).decode()
+    assert 'mosic_streams_total{song_id="a",title="New title"} 2.0' in exposition
+    assert "Old title" not in exposition
+
+
+def test_off_mode_exports_nothing():
+    leaderboard = StreamLeaderboard(capacity=0)
+    leaderboard.update("a", "A", 1)
+    assert len(leaderboard) == 0
+
+
+@pytest.mark.anyio
+async def test_seed_and_flush_rebuild_top_songs(session_factory):
+    async with session_factory() as session:
+        session.add_all(
+            Song(id=song_id, title=song_id.upper(), duration=1, audio_url=f"/media/{song_id}")
+            for song_id in ("a", "b", "c")
+        )
+        await session.flush()
+        session.add_all(
+            [PlayCount(id="a", count=4), PlayCount(id="b", count=9), PlayCount(id="c", count=1)]
+        )
+        await session.commit()
+
+    leaderboard = StreamLeaderboard(capacity=2)
+    assert await leaderboard.seed(session_factory) == 2
+    assert leaderboard.top() == [("b", "B", 9), ("a", "A", 4)]
+
+    aggregator = PlayCountAggregator(
+        flush_interval=60,
+        max_pending=100,
+        session_factory=session_factory,
+        leaderboard=leaderboard,
+    )
+    for _ in range(10):
+        aggregator.record("c", "C")
+    await aggregator.flush()
+
+    assert leaderboard.top() == [("c", "C", 11), ("b", "B", 9)]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core.media import (
+    AudioContentMismatchError,
+    IncomingAudioFile,
+    content_addressed_path,
+    media_path_for_url,
+    sniff_audio_format,
+)
+
+
+def test_content_addressed_path_is_sharded():
+    digest = "abcdef" + "0" * 58
+    assert content_addressed_path(Path("media"), digest, ".FLAC") == Path(
+        "media", "ab", "cd", f"{digest}.flac"
+    )
+
+
+@pytest.mark.parametrize(
+    ("audio_url", "expected"),
+    [
+        ("/media/ab/cd/abcd.mp3", Path("root", "ab", "cd", "abcd.mp3")),
+        ("/media/legacy.mp3", Path("root", "legacy.mp3")),
+        ("https://cdn.example.com/elsewhere/legacy.mp3", Path("root", "legacy.mp3")),
+    ],
+)
+def test_media_path_for_url(audio_url, expected):
+    assert media_path_for_url(audio_url, Path("root"), "/media") == expected
+
+
+def test_media_path_for_url_rejects_traversal():
+    with pytest.raises(ValueError):
+        media_path_for_url("/media/../secrets.txt", Path("root"), "/media")
+
+
+@pytest.mark.parametrize(
+    ("head", "expected"),
+    [
+        (b"ID3\x04\x00\x00\x00\x00\x00\x00\x00\x00", "mp3"),
+        (b"\xff\xfb\x90\x64" + b"\x00" * 8, "mp3"),
+        (b"RIFF\x24\x08\x00\x00WAVE", "wav"),
+        (b"fLaC\x00\x00\x00\x22" + b"\x00" * 4, "flac"),
+        (b"OggS\x00\x02" + b"\x00" * 6, "ogg"),
+        (b"\x00\x00\x00\x20ftypM4A ", "mp4"),
+        # ADTS (AAC) shares the sync word but not the layer bits
+        (b"\xff\xf1\x50\x80" + b"\x00" * 8, None),
+        (b"RIFF\x24\x08\x00\x00AVI ", None),
+        (b"<html><body>", None),
+    ],
+)
+def test_sniff_audio_format(head, expected):
+    assert sniff_audio_format(head) == expected
+
+
+def test_incoming_file_rejects_mismatch_before_writing(tmp_path: Path):
+    incoming = IncomingAudioFile(tmp_path, content_type="audio/flac")
+    incoming.write(b"ID3\x04")
+    assert incoming.temp_path.stat().st_size == 0
+
+    with pytest.raises(AudioContentMismatchError):
+        incoming.write(b"\x00" * 1024)
+    assert incoming.temp_path.stat().st_size == 0
+    incoming.discard()
+
+
+def test_incoming_file_records_sniffed_format(tmp_path: Path):
+    incoming = IncomingAudioFile(tmp_path, content_type="audio/mpeg")
+    for chunk in (b"ID3", b"\x04\x00", b"\x00" * 100):
+        incoming.write(chunk)
+    stored = incoming.commit()
+
+    assert stored.audio_format == "mp3"
+    assert stored.path.read_bytes() == b"ID3\x04\x00" + b"\x00" * 100
+
+
+def test_incoming_file_judges_short_body_on_commit(tmp_path: Path):
+    incoming = IncomingAudioFile(tmp_path, content_type="audio/mpeg")
+    incoming.write(b"abc")
+
+    with pytest.raises(AudioContentMismatchError):
+        incoming.commit()
+    incoming.discard()
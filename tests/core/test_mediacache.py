@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from app.core.mediacache import MediaCache
+
+
+def _write(tmp_path: Path, name: str, size: int) -> Path:
+    path = tmp_path / name
+    path.write_bytes(bytes(index % 251 for index in range(size)))
+    return path
+
+
+def test_maps_file_after_min_hits(tmp_path):
+    cache = MediaCache(max_bytes=1024, max_file_bytes=1024, min_hits=2)
+    path = _write(tmp_path, "a.mp3", 100)
+
+    assert cache.get(path, 100, "v1") is None
+    view = cache.get(path, 100, "v1")
+
+    assert view is not None
+    assert bytes(view[10:20]) == path.read_bytes()[10:20]
+    assert cache.resident_bytes == 100
+    assert cache.get(path, 100, "v1") is view
+
+
+def test_evicts_least_played_file_to_fit_budget(tmp_path):
+    cache = MediaCache(max_bytes=250, max_file_bytes=250, min_hits=1)
+    hot = _write(tmp_path, "hot.mp3", 100)
+    warm = _write(tmp_path, "warm.mp3", 100)
+    cold = _write(tmp_path, "cold.mp3", 100)
+
+    for _ in range(3):
+        cache.get(hot, 100, "hot")
+    cache.get(warm, 100, "warm")
+    cache.get(warm, 100, "warm")
+
+    # a single play of a cold track does not displace files played more often
+    assert cache.get(cold, 100, "cold") is None
+    assert cache.get(cold, 100, "cold") is None
+    assert cache.get(cold, 100, "cold") is not None
+    assert len(cache) == 2
+    assert cache.resident_bytes == 200
+    assert cache.get(hot, 100, "hot") is not None
+
+
+def test_changed_file_is_remapped(tmp_path):
+    cache = MediaCache(max_bytes=1024, max_file_bytes=1024, min_hits=1)
+    path = _write(tmp_path, "a.mp3", 100)
+    assert cache.get(path, 100, "v1") is not None
+
+    path.write_bytes(b"x" * 50)
+    view = cache.get(path, 50, "v2")
+
+    assert bytes(view) == b"x" * 50
+    assert cache.resident_bytes == 50
+
+
+def test_size_mismatch_is_not_cached(tmp_path):
+    cache = MediaCache(max_bytes=1024, max_file_bytes=1024, min_hits=1)
+    path = _write(tmp_path, "a.mp3", 100)
+
+    assert cache.get(path, 80, "stale") is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache_and_oversized_files_are_not_mapped(tmp_path):
+    path = _write(tmp_path, "a.mp3", 100)
+    assert MediaCache(max_bytes=0, max_file_bytes=1024, min_hits=1).get(path, 100, "v1") is None
+    assert MediaCache(max_bytes=1024, max_file_bytes=50, min_hits=1).get(path, 100, "v1") is None
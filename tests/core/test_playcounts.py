@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import event, func, select
+
+from app.core import cache
+from app.core.config import settings
+from app.core.playcounts import PlayCountAggregator, PlayDedupWindow
+from app.models.song import Song
+from app.models.stats import PlayBucket, PlayCount, bucket_start
+
+
+async def _seed_songs(session_factory, *song_ids: str) -> None:
+    async with session_factory() as session:
+        session.add_all(
+            Song(id=song_id, title=song_id, duration=1, audio_url=f"/media/{song_id}.mp3")
+            for song_id in song_ids
+        )
+        await session.commit()
+
+
+async def _counts(session_factory) -> dict[str, int]:
+    async with session_factory() as session:
+        result = await session.execute(select(PlayCount.id, PlayCount.count))
+        return dict(result.tuples().all())
+
+
+@pytest.mark.anyio
+async def test_flush_upserts_buffered_increments(session_factory):
+    aggregator = PlayCountAggregator(
+        flush_interval=60, max_pending=100, session_factory=session_factory
+    )
+    await _seed_songs(session_factory, "existing", "fresh")
+    async with session_factory() as session:
+        session.add(PlayCount(id="existing", count=5))
+        await session.commit()
+
+    for song_id in ("existing", "existing", "fresh"):
+        aggregator.record(song_id, song_id)
+    await aggregator.flush()
+
+    assert await _counts(session_factory) == {"existing": 7, "fresh": 1}
+    assert aggregator.pending == 0
+
+
+async def _buckets(session_factory) -> dict[tuple[str, str], int]:
+    async with session_factory() as session:
+        result = await session.execute(select(PlayBucket.song_id, PlayBucket.period, PlayBucket.count))
+        return {(song_id, period): count for song_id, period, count in result}
+
+
+@pytest.mark.anyio
+async def test_flush_adds_plays_to_history_buckets(session_factory):
+    await _seed_songs(session_factory, "a", "b")
+    aggregator = PlayCountAggregator(
+        flush_interval=60, max_pending=100, session_factory=session_factory
+    )
+    for song_id in ("a", "a", "b"):
+        aggregator.record(song_id, song_id)
+    await aggregator.flush()
+    aggregator.record("a", "a")
+    await aggregator.flush()
+
+    assert await _buckets(session_factory) == {
+        ("a", "hour"): 3,
+        ("a", "day"): 3,
+        ("b", "hour"): 1,
+        ("b", "day"): 1,
+    }
+
+
+@pytest.mark.anyio
+async def test_prune_drops_buckets_past_retention(session_factory, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "PLAY_HISTORY_HOURLY_RETENTION_HOURS", 2)
+    monkeypatch.setattr(settings, "PLAY_HISTORY_DAILY_RETENTION_DAYS", 3)
+    await _seed_songs(session_factory, "song")
+    now = datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc)
+    hour, day = bucket_start(now, "hour"), bucket_start(now, "day")
+    async with session_factory() as session:
+        session.add_all(
+            [
+                PlayBucket(song_id="song", period="hour", start=hour - timedelta(hours=offset), count=1)
+                for offset in range(4)
+            ]
+            + [
+                PlayBucket(song_id="song", period="day", start=day - timedelta(days=offset), count=1)
+                for offset in range(5)
+            ]
+        )
+        await session.commit()
+
+    async with session_factory() as session:
+        assert await PlayBucket.prune(session, now=now) == 2
+
+    async with session_factory() as session:
+        result = await session.execute(select(PlayBucket.period, func.count()).group_by(PlayBucket.period))
+        assert dict(result.tuples().all()) == {"hour": 3, "day": 4}
+
+
+@pytest.mark.anyio
+async def test_flush_drops_increments_for_unknown_songs(session_factory):
+    await _seed_songs(session_factory, "kept")
+    aggregator = PlayCountAggregator(
+        flush_interval=60, max_pending=100, session_factory=session_factory
+    )
+    aggregator.record("kept", "Kept")
+    aggregator.record("deleted", "Deleted")
+    await aggregator.flush()
+
+    assert await _counts(session_factory) == {"kept": 1}
+    assert aggregator.pending == 0
+
+
+@pytest.mark.anyio
+async def test_failed_flush_requeues_increments(session_factory):
+    def broken_factory():
+        raise RuntimeError("database unavailable")
+
+    await _seed_songs(session_factory, "song")
+    aggregator = PlayCountAggregator(
+        flush_interval=60, max_pending=100, session_factory=broken_factory
+    )
+    aggregator.record("song", "Song")
+    aggregator.record("song", "Song")
+
+    with pytest.raises(RuntimeError):
+        await aggregator.flush()
+    assert aggregator.pending == 2
+
+    aggregator._session_factory = session_factory
+    await aggregator.flush()
+    assert await _counts(session_factory) == {"song": 2}
+
+
+@pytest.mark.anyio
+async def test_flush_splits_large_backlogs_into_batches(
+    session_factory, test_engine, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "PLAYCOUNT_UPSERT_BATCH_SIZE", 2)
+    song_ids = [f"song-{index}" for index in range(5)]
+    await _seed_songs(session_factory, *song_ids)
+    aggregator = PlayCountAggregator(
+        flush_interval=60, max_pending=100, session_factory=session_factory
+    )
+    for song_id in song_ids:
+        aggregator.record(song_id, song_id)
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement.split("(")[0].strip())
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        await aggregator.flush()
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", _record)
+
+    assert statements.count("INSERT INTO play_counts") == 3
+    assert statements.count("INSERT INTO play_buckets") == 3
+    assert await _counts(session_factory) == {song_id: 1 for song_id in song_ids}
+
+
+def test_buffer_is_capped_while_flushes_fail():
+    aggregator = PlayCountAggregator(flush_interval=60, max_pending=1000, max_pending_songs=2)
+    dropped = REGISTRY.get_sample_value("mosic_playcount_dropped_total") or 0.0
+
+    for song_id in ("a", "b", "c", "a"):
+        aggregator.record(song_id, song_id)
+    aggregator._requeue({"b": 3, "d": 4}, {"b": "b", "d": "d"}, None)
+
+    assert aggregator._pending == {"a": 2, "b": 4}
+    assert aggregator.pending == 6
+    assert REGISTRY.get_sample_value("mosic_playcount_dropped_total") == dropped + 5
+
+
+@pytest.mark.anyio
+async def test_size_threshold_triggers_background_flush(session_factory):
+    await _seed_songs(session_factory, "song")
+    aggregator = PlayCountAggregator(
+        flush_interval=60, max_pending=2, session_factory=session_factory
+    )
+    aggregator.start()
+    try:
+        aggregator.record("song", "Song")
+        aggregator.record("song", "Song")
+        # the in-memory engine shares one connection, so wait for the flush
+        # to finish before reading instead of polling the table
+        for _ in range(50):
+            if aggregator.pending == 0 and not aggregator._flush_lock.locked():
+                break
+            await asyncio.sleep(0.01)
+        assert await _counts(session_factory) == {"song": 2}
+    finally:
+        await aggregator.close()
+
+
+def test_dedup_window_admits_again_after_it_expires(monkeypatch: pytest.MonkeyPatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    window = PlayDedupWindow(window=30, max_entries=10)
+
+    assert window.admit("listener", "song")
+    now += 29
+    assert not window.admit("listener", "song")
+    assert window.admit("listener", "other-song")
+    now += 2
+    assert window.admit("listener", "song")
+
+
+def test_dedup_window_is_bounded_and_can_be_disabled():
+    window = PlayDedupWindow(window=30, max_entries=2)
+    for listener in ("a", "b", "c"):
+        assert window.admit(listener, "song")
+    # "a" was evicted to stay within max_entries, so its repeat gets through
+    assert window.admit("a", "song")
+    assert not window.admit("c", "song")
+
+    disabled = PlayDedupWindow(window=0, max_entries=2)
+    assert disabled.admit("a", "song") and disabled.admit("a", "song")
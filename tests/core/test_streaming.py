@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core.streaming import (
+    ByteRange,
+    RangeNotSatisfiableError,
+    if_range_matches,
+    parse_range_header,
+    ranged_file_response,
+)
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("bytes=0-99", [ByteRange(0, 99)]),
+        ("bytes=900-", [ByteRange(900, 999)]),
+        ("bytes=-100", [ByteRange(900, 999)]),
+        ("bytes=950-2000", [ByteRange(950, 999)]),
+        ("bytes=0-9, 5-19, 40-49", [ByteRange(0, 19), ByteRange(40, 49)]),
+        ("bytes=10-19,20-29", [ByteRange(10, 29)]),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "items=0-1", "bytes=a-b", "bytes=9-1", "bytes=-"])
+def test_parse_range_header_ignores_invalid_headers(header):
+    assert parse_range_header(header, 1000) is None
+
+
+def test_parse_range_header_rejects_ranges_past_end():
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range_header("bytes=1000-1001, -0", 1000)
+
+
+def test_if_range_requires_strong_match():
+    etag, last_modified = '"abc"', "Tue, 01 Jan 2030 00:00:00 GMT"
+    assert if_range_matches(None, etag, last_modified)
+    assert if_range_matches('"abc"', etag, last_modified)
+    assert if_range_matches(last_modified, etag, last_modified)
+    assert not if_range_matches('W/"abc"', etag, last_modified)
+    assert not if_range_matches('"other"', etag, last_modified)
+
+
+async def _run_response(file_path: Path, headers: dict[str, str], extensions: dict) -> list[dict]:
+    response = ranged_file_response(
+        file_path,
+        "audio/mpeg",
+        headers,
+        size=file_path.stat().st_size,
+        etag='"abc"',
+        chunk_size=4,
+    )
+    messages: list[dict] = []
+
+    async def receive() -> dict:  # pragma: no cover - never awaited
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "extensions": extensions}
+    await response(scope, receive, send)
+    return messages
+
+
+@pytest.mark.anyio
+async def test_full_response_uses_pathsend_when_available(tmp_path: Path):
+    media_file = tmp_path / "track.mp3"
+    media_file.write_bytes(b"0123456789")
+
+    messages = await _run_response(media_file, {}, {"http.response.pathsend": {}})
+
+    assert [message["type"] for message in messages] == [
+        "http.response.start",
+        "http.response.pathsend",
+    ]
+    assert messages[1]["path"] == str(media_file.resolve())
+
+
+@pytest.mark.anyio
+async def test_ranges_use_zerocopy_when_available(tmp_path: Path):
+    media_file = tmp_path / "track.mp3"
+    media_file.write_bytes(b"0123456789")
+
+    messages = await _run_response(
+        media_file, {"range": "bytes=2-5"}, {"http.response.zerocopy": {}}
+    )
+
+    assert messages[0]["status"] == 206
+    zerocopy = [m for m in messages if m["type"] == "http.response.zerocopy"]
+    assert [(m["offset"], m["count"]) for m in zerocopy] == [(2, 4)]
+    assert messages[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+@pytest.mark.anyio
+async def test_falls_back_to_async_chunked_reads(tmp_path: Path):
+    media_file = tmp_path / "track.mp3"
+    media_file.write_bytes(b"0123456789")
+
+    messages = await _run_response(media_file, {"range": "bytes=1-8"}, {})
+
+    chunks = [m["body"] for m in messages if m["type"] == "http.response.body"]
+    assert chunks == [b"1234", b"5678", b""]
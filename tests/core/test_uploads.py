@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import os
+from pathlib import Path
+
+import pytest
+
+from app.core.uploads import (
+    UploadOffsetMismatch,
+    UploadSessionBusy,
+    UploadSessionNotFound,
+    append_upload_chunk,
+    create_upload_session,
+    get_upload_session,
+    purge_expired_upload_sessions,
+)
+
+
+def test_abandoned_upload_sessions_are_purged(tmp_path: Path):
+    session = create_upload_session(
+        tmp_path, filename="x.mp3", content_type="audio/mpeg", length=None
+    )
+    assert purge_expired_upload_sessions(tmp_path, ttl=3600) == 0
+
+    for leftover in (tmp_path / ".uploads").iterdir():
+        os.utime(leftover, (0, 0))
+
+    assert purge_expired_upload_sessions(tmp_path, ttl=3600) == 1
+    assert not any((tmp_path / ".uploads").iterdir())
+    with pytest.raises(UploadSessionNotFound):
+        get_upload_session(tmp_path, session.id)
+
+
+@pytest.mark.anyio
+async def test_concurrent_appends_at_the_same_offset_write_once(tmp_path: Path):
+    session = create_upload_session(
+        tmp_path, filename="x.mp3", content_type="audio/mpeg", length=None
+    )
+    release = asyncio.Event()
+
+    async def slow_body():
+        yield b"ID3" + b"a" * 97
+        await release.wait()
+        yield b"b" * 100
+
+    async def fast_body():
+        yield b"ID3" + b"c" * 197
+
+    first = asyncio.create_task(append_upload_chunk(tmp_path, session.id, 0, slow_body()))
+    await asyncio.sleep(0.05)
+    with pytest.raises(UploadSessionBusy):
+        await append_upload_chunk(tmp_path, session.id, 0, fast_body())
+    release.set()
+
+    assert (await first).offset == 200
+    with pytest.raises(UploadOffsetMismatch):
+        await append_upload_chunk(tmp_path, session.id, 0, fast_body())
+    assert get_upload_session(tmp_path, session.id).offset == 200
+
+
+@pytest.mark.anyio
+async def test_append_is_refused_while_another_worker_holds_the_session(tmp_path: Path):
+    session = create_upload_session(
+        tmp_path, filename="x.mp3", content_type="audio/mpeg", length=None
+    )
+
+    async def body():
+        yield b"ID3" + b"a" * 10
+
+    with open(tmp_path / ".uploads" / f"{session.id}.part", "ab") as other_worker:
+        fcntl.flock(other_worker.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with pytest.raises(UploadSessionBusy):
+            await append_upload_chunk(tmp_path, session.id, 0, body())
+
+    assert (await append_upload_chunk(tmp_path, session.id, 0, body())).offset == 13
@@ -1,18 +1,38 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import hashlib
+import io
+import json
 import mimetypes
 from pathlib import Path
+from typing import Iterator
+import wave
+import zipfile
 
 import pytest
+from fastapi import Request
+from prometheus_client import REGISTRY
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
 
 from app.core.auth import API_KEY_HEADER_NAME
 from app.core.config import settings
-from app.models.song import Song
-from app.models.stats import PlayCount
+from app.core.ingest import ingest_pipeline
+from app.core.mediacache import MediaCache
+from app.core.playcounts import playcount_aggregator
+from app.core.streaming import http_date
+from app.main import app as fastapi_app
+from app.models.catalogue import CatalogueVersion, catalogue_cache
+from app.models.song import Song, song_cache
+from app.models.stats import PlayBucket, PlayCount, bucket_start
+from app.routers import play as play_router
 
 
 def _media_contents() -> list[Path]:
-    return [p for p in settings.media_path.glob("*") if p.is_file()]
+    return [p for p in settings.media_path.rglob("*") if p.is_file()]
 
 
 @pytest.mark.anyio
@@ -47,6 +67,338 @@ async def test_list_songs_returns_persisted_entries(client, session_factory):
     assert {song["id"] for song in payload} == {"song-1", "song-2"}
 
 
+async def _seed_catalogue(session_factory, count: int) -> None:
+    async with session_factory() as session:
+        session.add_all(
+            Song(
+                id=f"song-{index:03d}",
+                title=f"Track {index % 4}",
+                description=None,
+                duration=index * 10,
+                audio_url=f"/media/{index}.mp3",
+            )
+            for index in range(count)
+        )
+        await session.commit()
+
+
+@pytest.mark.anyio
+async def test_list_songs_paginates_with_cursor(client, session_factory):
+    await _seed_catalogue(session_factory, 7)
+
+    seen: list[dict] = []
+    cursor = None
+    for _ in range(10):
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/play/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 3
+        seen.extend(page)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+    assert len(seen) == 7
+    assert [(song["title"], song["id"]) for song in seen] == sorted(
+        (song["title"], song["id"]) for song in seen
+    )
+
+
+@contextmanager
+def _recorded_statements(test_engine) -> Iterator[list[str]]:
+    statements: list[str] = []
+
+    def before_execute(_conn, _cursor, statement, *_args) -> None:
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", before_execute)
+
+
+@pytest.mark.anyio
+async def test_list_songs_serves_cached_page_and_304_without_queries(
+    client, session_factory, test_engine
+):
+    await _seed_catalogue(session_factory, 3)
+    first = await client.get("/play/", params={"limit": 2})
+    etag = first.headers["etag"]
+
+    with _recorded_statements(test_engine) as statements:
+        again = await client.get("/play/", params={"limit": 2})
+        unchanged = await client.get(
+            "/play/", params={"limit": 2}, headers={"If-None-Match": etag}
+        )
+
+    assert again.content == first.content
+    assert again.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert statements == []
+
+
+@pytest.mark.anyio
+async def test_list_songs_etag_changes_after_write(client, session_factory):
+    await _seed_catalogue(session_factory, 2)
+    before = await client.get("/play/")
+
+    uploaded = await client.post(
+        "/play/upload", files={"file": ("new.mp3", b"ID3 brand new", "audio/mpeg")}
+    )
+    after = await client.get("/play/", headers={"If-None-Match": before.headers["etag"]})
+
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert uploaded.json()["id"] in {song["id"] for song in after.json()}
+
+
+@pytest.mark.anyio
+async def test_list_songs_picks_up_other_workers_writes_on_poll(
+    client, session_factory, test_engine
+):
+    await _seed_catalogue(session_factory, 2)
+    before = await client.get("/play/")
+
+    # another worker: its write only shows up here through the version row
+    async with test_engine.begin() as connection:
+        await connection.execute(
+            Song.__table__.insert().values(
+                id="elsewhere", title="Elsewhere", duration=1, audio_url="/media/x.mp3"
+            )
+        )
+        await connection.execute(CatalogueVersion.bump_statement())
+
+    stale = await client.get("/play/")
+    await catalogue_cache.poll(session_factory)
+    fresh = await client.get("/play/")
+
+    assert stale.content == before.content
+    assert "elsewhere" in {song["id"] for song in fresh.json()}
+    assert fresh.headers["etag"] != before.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_list_songs_filters_by_title_prefix_and_duration(client, session_factory):
+    await _seed_catalogue(session_factory, 12)
+
+    response = await client.get(
+        "/play/",
+        params={"title_prefix": "Track 1", "min_duration": 20, "max_duration": 90},
+    )
+
+    assert response.status_code == 200
+    assert [song["id"] for song in response.json()] == ["song-005", "song-009"]
+    assert "x-next-cursor" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_title_prefix_is_case_sensitive_and_literal(client, session_factory, test_engine):
+    titles = ("100% Hits", "1000 Songs", "a_b/c", "axb/c", "Track One", "track two", "x*y[1]?", "xzy")
+    async with session_factory() as session:
+        session.add_all(
+            Song(id=title, title=title, duration=1, audio_url=f"/media/{index}.mp3")
+            for index, title in enumerate(titles)
+        )
+        await session.commit()
+
+    async def matching(prefix: str) -> list[str]:
+        response = await client.get("/play/", params={"title_prefix": prefix})
+        return [song["id"] for song in response.json()]
+
+    assert await matching("Track") == ["Track One"]
+    assert await matching("track") == ["track two"]
+    assert await matching("100%") == ["100% Hits"]
+    assert await matching("a_b/") == ["a_b/c"]
+    assert await matching("x*y[1]?") == ["x*y[1]?"]
+
+    with _recorded_statements(test_engine) as statements:
+        assert await matching("Tra") == ["Track One"]
+    (query,) = [statement for statement in statements if "FROM songs" in statement]
+    async with test_engine.connect() as connection:
+        plan = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}", ("Tra*", 51, 0))
+        details = " ".join(row[-1] for row in plan)
+    # a range seek on the title index, not a scan
+    assert "SEARCH songs USING" in details and "title>?" in details
+
+
+@pytest.mark.anyio
+async def test_title_pattern_index_is_created_on_postgresql_only(test_engine):
+    (index,) = [index for index in Song.__table__.indexes if index.name == "ix_songs_title_pattern"]
+
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+
+    assert ddl == "CREATE INDEX ix_songs_title_pattern ON songs (title text_pattern_ops)"
+    async with test_engine.connect() as connection:
+        result = await connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'songs'"
+        )
+        assert "ix_songs_title_pattern" not in set(result.scalars())
+
+
+@pytest.mark.anyio
+async def test_list_songs_rejects_malformed_cursor(client):
+    response = await client.get("/play/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_list_songs_caps_limit(client):
+    response = await client.get("/play/", params={"limit": settings.LIST_MAX_LIMIT + 1})
+    assert response.status_code == 422
+
+
+def _song_import(index: int, **overrides) -> dict:
+    return {
+        "title": f"Imported {index}",
+        "duration": index,
+        "audio_url": f"/media/imported-{index}.mp3",
+        **overrides,
+    }
+
+
+@pytest.mark.anyio
+async def test_bulk_create_inserts_json_array_in_batches(
+    client, session_factory, monkeypatch
+):
+    monkeypatch.setattr(settings, "BULK_CREATE_BATCH_SIZE", 2)
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO songs"):
+            statements.append(statement)
+
+    async with session_factory() as session:
+        engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        response = await client.post(
+            "/play/bulk", json=[_song_import(i) for i in range(5)]
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    assert response.status_code == 201
+    ids = response.json()["ids"]
+    assert len(ids) == 5
+    assert len(statements) == 3
+
+    async with session_factory() as session:
+        songs = [await Song.get_by_id(session, song_id) for song_id in ids]
+    assert [song.title for song in songs] == [f"Imported {i}" for i in range(5)]
+
+
+@pytest.mark.anyio
+async def test_bulk_create_accepts_ndjson_and_upserts(client, session_factory):
+    first = await client.post(
+        "/play/bulk", json=[_song_import(1, id="ext-1"), _song_import(2, id="ext-2")]
+    )
+    assert first.status_code == 201
+
+    body = "\n".join(
+        json.dumps(row)
+        for row in (
+            _song_import(1, id="ext-1", title="Renamed"),
+            _song_import(3, id="ext-3"),
+        )
+    )
+    headers = {"content-type": "application/x-ndjson"}
+
+    conflict = await client.post("/play/bulk", content=body, headers=headers)
+    assert conflict.status_code == 409
+
+    ignored = await client.post(
+        "/play/bulk?on_conflict=ignore", content=body, headers=headers
+    )
+    assert ignored.status_code == 201
+    assert ignored.json() == {"ids": ["ext-3"], "skipped": ["ext-1"]}
+
+    updated = await client.post(
+        "/play/bulk?on_conflict=update", content=body, headers=headers
+    )
+    assert updated.status_code == 201
+    assert updated.json() == {"ids": ["ext-1", "ext-3"], "skipped": []}
+
+    renamed = await client.get("/play/ext-1")
+    assert renamed.json()["title"] == "Renamed"
+
+
+@pytest.mark.anyio
+async def test_bulk_update_repointing_audio_url_drops_stale_file_columns(client, session_factory):
+    old_body, new_body = b"ID3 the old file", b"ID3 a replacement file, longer"
+    (settings.media_path / "old.mp3").write_bytes(old_body)
+    (settings.media_path / "new.mp3").write_bytes(new_body)
+    async with session_factory() as session:
+        session.add(
+            Song(
+                id="repointed",
+                title="Before",
+                duration=1,
+                audio_url=f"{settings.media_url_path}/old.mp3",
+                content_hash=hashlib.sha256(old_body).hexdigest(),
+                size_bytes=len(old_body),
+                mime_type="audio/mpeg",
+                codec="mp3",
+            )
+        )
+        await session.commit()
+    before = await client.get("/play/repointed/stream")
+    assert before.headers["etag"] == f'"{hashlib.sha256(old_body).hexdigest()}"'
+
+    renamed = _song_import(1, id="repointed", title="Renamed", audio_url=f"{settings.media_url_path}/old.mp3")
+    await client.post("/play/bulk?on_conflict=update", json=[renamed])
+    async with session_factory() as session:
+        kept = await Song.get_by_id(session, "repointed")
+    assert (kept.title, kept.size_bytes, kept.codec) == ("Renamed", len(old_body), "mp3")
+
+    moved = _song_import(1, id="repointed", audio_url=f"{settings.media_url_path}/new.mp3")
+    await client.post("/play/bulk?on_conflict=update", json=[moved])
+    after = await client.get("/play/repointed/stream")
+
+    assert after.content == new_body
+    assert after.headers["content-length"] == str(len(new_body))
+    assert after.headers["etag"] != before.headers["etag"]
+    async with session_factory() as session:
+        song = await Song.get_by_id(session, "repointed")
+    assert (song.content_hash, song.size_bytes, song.mime_type, song.codec) == (None, None, None, None)
+
+
+@pytest.mark.anyio
+async def test_bulk_create_rolls_back_on_invalid_line(client):
+    body = json.dumps(_song_import(1)) + "\n" + json.dumps({"title": "no duration"})
+
+    response = await client.post(
+        "/play/bulk", content=body, headers={"content-type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Line 2: duration: Field required; audio_url: Field required"
+    listing = await client.get("/play/")
+    assert listing.json() == []
+
+
+@pytest.mark.anyio
+async def test_bulk_create_rejects_oversized_json_body(client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "BULK_CREATE_MAX_MB", 1)
+    body = json.dumps([_song_import(i) for i in range(20_000)]).encode()
+    assert len(body) > settings.bulk_create_max_bytes
+
+    async def _chunked():
+        # no content-length, so the cap has to hold while reading
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start : start + 64 * 1024]
+
+    declared = await client.post("/play/bulk", content=body, headers={"content-type": "application/json"})
+    streamed = await client.post("/play/bulk", content=_chunked(), headers={"content-type": "application/json"})
+
+    assert (declared.status_code, streamed.status_code) == (413, 413)
+    assert (await client.get("/play/")).json() == []
+
+
 @pytest.mark.anyio
 async def test_get_song_stats_requires_existing_song(client):
     response = await client.get("/play/nonexistent/stats")
@@ -72,8 +424,92 @@ async def test_get_song_stats_returns_playcount(client, session_factory):
     assert response.status_code == 200
     payload = response.json()
     assert payload["id"] == song_id
+    assert payload["title"] == "Stats"
     assert payload["count"] == 0
 
+    async with session_factory() as session:
+        assert (await session.get(PlayCount, song_id)) is None
+
+
+@pytest.mark.anyio
+async def test_batch_stats_reads_counts_in_one_query(client, session_factory):
+    await _seed_catalogue(session_factory, 3)
+    async with session_factory() as session:
+        session.add(PlayCount(id="song-001", count=7))
+        await session.commit()
+        engine = session.get_bind()
+
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        response = await client.post(
+            "/play/stats", json={"ids": ["song-001", "song-002", "unknown", "song-001"]}
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert [(song["id"], song["count"]) for song in payload["songs"]] == [
+        ("song-001", 7),
+        ("song-002", 0),
+    ]
+    assert payload["songs"][0]["title"] == "Track 1"
+    assert payload["missing"] == ["unknown"]
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("SELECT")
+
+    async with session_factory() as session:
+        assert (await session.get(PlayCount, "song-002")) is None
+
+
+@pytest.mark.anyio
+async def test_trending_sums_buckets_within_window(client, session_factory):
+    await _seed_catalogue(session_factory, 3)
+    now = datetime.now(timezone.utc)
+    hour, day = bucket_start(now, "hour"), bucket_start(now, "day")
+    async with session_factory() as session:
+        session.add_all(
+            [
+                PlayBucket(song_id="song-001", period="hour", start=hour, count=2),
+                PlayBucket(song_id="song-002", period="hour", start=hour, count=5),
+                PlayBucket(song_id="song-001", period="hour", start=hour - timedelta(hours=10), count=9),
+                PlayBucket(song_id="song-000", period="day", start=day - timedelta(days=5), count=40),
+                PlayBucket(song_id="song-001", period="day", start=day, count=11),
+                PlayBucket(song_id="song-002", period="day", start=day - timedelta(days=20), count=99),
+            ]
+        )
+        await session.commit()
+
+    recent = await client.get("/play/trending", params={"window": "1h"})
+    assert recent.status_code == 200
+    assert recent.json() == [
+        {"id": "song-002", "title": "Track 2", "plays": 5},
+        {"id": "song-001", "title": "Track 1", "plays": 2},
+    ]
+
+    day_window = await client.get("/play/trending", params={"window": "24h", "limit": 1})
+    assert [song["id"] for song in day_window.json()] == ["song-001"]
+    assert day_window.json()[0]["plays"] == 11
+
+    # beyond the hourly retention the daily buckets are summed
+    week = await client.get("/play/trending", params={"window": "7d"})
+    assert [(song["id"], song["plays"]) for song in week.json()] == [("song-000", 40), ("song-001", 11)]
+
+
+@pytest.mark.anyio
+async def test_trending_rejects_windows_outside_history(client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "PLAY_HISTORY_DAILY_RETENTION_DAYS", 30)
+
+    assert (await client.get("/play/trending", params={"window": "31d"})).status_code == 422
+    assert (await client.get("/play/trending", params={"window": "30d"})).status_code == 200
+    assert (await client.get("/play/trending", params={"window": "0h"})).status_code == 422
+    assert (await client.get("/play/trending", params={"window": "week"})).status_code == 422
+
 
 @pytest.mark.anyio
 async def test_upload_rejects_unsupported_audio_type(client):
@@ -97,6 +533,87 @@ async def test_upload_rejects_file_exceeding_limit(
     )
 
     assert response.status_code == 413
+    assert _media_contents() == []
+
+
+@pytest.mark.anyio
+async def test_upload_streams_body_without_spooling_form(
+    client, monkeypatch: pytest.MonkeyPatch
+):
+    async def no_spooling(*_args, **_kwargs):
+        raise AssertionError("request body was spooled through Request.form()")
+
+    monkeypatch.setattr(Request, "form", no_spooling)
+
+    response = await client.post(
+        "/play/upload",
+        files={"file": ("streamed.mp3", b"ID3 streamed body", "audio/mpeg")},
+        data={"title": "Streamed", "description": "Straight to disk"},
+    )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["title"] == "Streamed"
+    assert payload["description"] == "Straight to disk"
+    assert [p.name for p in _media_contents()] == [f"{payload['content_hash']}.mp3"]
+
+
+@pytest.mark.anyio
+async def test_upload_rejects_oversized_declared_length_before_reading(
+    client, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_MB", 1)
+
+    async def body():
+        raise AssertionError("body was read")
+        yield b""  # pragma: no cover
+
+    response = await client.post(
+        "/play/upload",
+        content=body(),
+        headers={
+            "content-type": "multipart/form-data; boundary=x",
+            "content-length": str(settings.max_upload_bytes * 2),
+        },
+    )
+
+    assert response.status_code == 413
+    assert _media_contents() == []
+
+
+@pytest.mark.anyio
+async def test_upload_requires_file_part(client):
+    response = await client.post(
+        "/play/upload",
+        files={"title": (None, "No file")},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_background_ingest_creates_pending_song_then_fills_metadata(
+    client, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "INGEST_MODE", "background")
+
+    response = await client.post(
+        "/play/upload",
+        files={"file": ("later.mp3", b"ID3 background body", "audio/mpeg")},
+        data={"description": "Queued"},
+    )
+
+    assert response.status_code == 202
+    song = response.json()
+    assert song["status"] == "pending"
+    assert song["title"] == "later"
+
+    await ingest_pipeline.join()
+
+    assert ingest_pipeline._executor._mp_context.get_start_method() in ("forkserver", "spawn")
+    polled = await client.get(f"/play/{song['id']}")
+    assert polled.status_code == 200
+    assert polled.json()["status"] == "ready"
+    assert polled.json()["description"] == "Queued"
 
 
 @pytest.mark.anyio
@@ -110,13 +627,445 @@ async def test_upload_cleans_up_file_on_database_failure(
 
     response = await client.post(
         "/play/upload",
-        files={"file": ("track.mp3", b"abc", "audio/mpeg")},
+        files={"file": ("track.mp3", b"ID3abc", "audio/mpeg")},
     )
 
     assert response.status_code == 500
     assert _media_contents() == []
 
 
+@pytest.mark.anyio
+async def test_upload_stores_file_under_content_hash(client, session_factory):
+    body = b"ID3 fake audio body"
+    digest = hashlib.sha256(body).hexdigest()
+
+    response = await client.post(
+        "/play/upload",
+        files={"file": ("Track.MP3", body, "audio/mpeg")},
+    )
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["content_hash"] == digest
+    assert payload["size_bytes"] == len(body)
+    assert payload["audio_url"] == (
+        f"{settings.media_url_path}/{digest[:2]}/{digest[2:4]}/{digest}.mp3"
+    )
+    assert _media_contents() == [
+        settings.media_path / digest[:2] / digest[2:4] / f"{digest}.mp3"
+    ]
+
+    stream = await client.get(f"/play/{payload['id']}/stream")
+    assert stream.status_code == 200
+    assert stream.content == body
+
+
+def _wav_body(frames: int = 800, sample_rate: int = 8000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(b"\x01\x00" * frames)
+    return buffer.getvalue()
+
+
+@pytest.mark.anyio
+async def test_upload_records_stream_format(client):
+    body = _wav_body()
+
+    response = await client.post("/play/upload", files={"file": ("tone.wav", body, "audio/wav")})
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["size_bytes"] == len(body)
+    assert payload["mime_type"] == "audio/wav"
+    assert payload["codec"] == "pcm"
+    assert payload["sample_rate"] == 8000
+    assert payload["bitrate"] == 128_000
+
+
+@pytest.mark.anyio
+async def test_stream_song_takes_headers_from_row_without_stat(client):
+    body = _wav_body()
+    song = (await client.post("/play/upload", files={"file": ("tone.wav", body, "audio/wav")})).json()
+    route = "/play/{song_id}/stream"
+    stats_before = _stage_count(route, "file_stat")
+
+    response = await client.get(f"/play/{song['id']}/stream")
+
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.headers["content-length"] == str(len(body))
+    assert response.headers["etag"] == f'"{song["content_hash"]}"'
+    assert response.headers["last-modified"] == http_date(datetime.fromisoformat(song["created_at"]))
+    assert response.headers["cache-control"] == settings.STREAM_CACHE_CONTROL
+    assert _stage_count(route, "file_stat") == stats_before
+
+
+@pytest.mark.anyio
+async def test_stream_song_revalidation_is_304_and_not_a_play(client, session_factory):
+    song = (await client.post("/play/upload", files={"file": ("tone.wav", _wav_body(), "audio/wav")})).json()
+    first = await client.get(f"/play/{song['id']}/stream")
+
+    by_etag = await client.get(
+        f"/play/{song['id']}/stream", headers={"If-None-Match": first.headers["etag"]}
+    )
+    by_date = await client.get(
+        f"/play/{song['id']}/stream", headers={"If-Modified-Since": first.headers["last-modified"]}
+    )
+
+    for response in (by_etag, by_date):
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == first.headers["etag"]
+        assert response.headers["cache-control"] == settings.STREAM_CACHE_CONTROL
+    await playcount_aggregator.flush()
+    async with session_factory() as session:
+        assert (await PlayCount.get_by_id(session, song["id"])).count == 1
+
+
+@pytest.mark.anyio
+async def test_stream_song_legacy_file_honours_if_modified_since(client, session_factory):
+    media_file = await _seed_streamable_song(session_factory, "legacy", b"0123456789")
+    last_modified = http_date(datetime.fromtimestamp(media_file.stat().st_mtime + 60))
+
+    response = await client.get("/play/legacy/stream", headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == 304
+
+
+@pytest.mark.anyio
+async def test_media_mount_marks_content_addressed_files_immutable(client):
+    song = (await client.post("/play/upload", files={"file": ("tone.wav", _wav_body(), "audio/wav")})).json()
+    (settings.media_path / "hand-placed.mp3").write_bytes(b"ID3 placed by hand")
+
+    stored = await client.get(song["audio_url"])
+    revalidated = await client.get(song["audio_url"], headers={"If-None-Match": stored.headers["etag"]})
+    placed = await client.get(f"{settings.media_url_path}/hand-placed.mp3")
+
+    assert stored.headers["cache-control"] == settings.MEDIA_IMMUTABLE_CACHE_CONTROL
+    assert revalidated.status_code == 304
+    assert revalidated.headers["cache-control"] == settings.MEDIA_IMMUTABLE_CACHE_CONTROL
+    assert placed.headers["cache-control"] == settings.MEDIA_CACHE_CONTROL
+
+
+@pytest.mark.anyio
+async def test_stream_song_missing_file_returns_404(client):
+    song = (await client.post("/play/upload", files={"file": ("gone.wav", _wav_body(), "audio/wav")})).json()
+    relative = song["audio_url"].removeprefix(f"{settings.media_url_path}/")
+    (settings.media_path / relative).unlink()
+
+    response = await client.get(f"/play/{song['id']}/stream")
+    messages = await _call_app(f"/play/{song['id']}/stream", {"http.response.pathsend": {}})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Audio file not found"}
+    assert messages[0]["status"] == 404
+    assert not any(m["type"] == "http.response.pathsend" for m in messages)
+    # the row alone is not enough to count a play
+    assert playcount_aggregator.pending == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    ("body", "content_type"),
+    [
+        (b"<html>not audio</html>" * 10, "audio/mpeg"),
+        (b"ID3 an mp3 labelled as flac", "audio/flac"),
+    ],
+)
+async def test_upload_rejects_content_not_matching_declared_type(client, body, content_type):
+    response = await client.post("/play/upload", files={"file": ("track.flac", body, content_type)})
+
+    assert response.status_code == 415
+    assert _media_contents() == []
+
+
+@pytest.mark.anyio
+async def test_resumable_upload_rejects_non_audio_first_chunk(client):
+    created = await client.post("/play/uploads", json={"filename": "x.wav", "content_type": "audio/wav"})
+    upload_id = created.json()["id"]
+
+    response = await client.patch(
+        f"/play/uploads/{upload_id}",
+        content=b"GIF89a" + b"\x00" * 100,
+        headers={"Upload-Offset": "0"},
+    )
+
+    assert response.status_code == 415
+    status = await client.get(f"/play/uploads/{upload_id}")
+    assert status.headers["upload-offset"] == "0"
+
+
+@pytest.mark.anyio
+async def test_upload_rejects_duplicate_body_without_second_copy(client):
+    body = b"ID3 the same track twice"
+
+    first = await client.post(
+        "/play/upload", files={"file": ("one.mp3", body, "audio/mpeg")}
+    )
+    second = await client.post(
+        "/play/upload", files={"file": ("two", body, "audio/mpeg")}
+    )
+
+    assert first.status_code == 200
+    assert second.status_code == 409
+    assert len(_media_contents()) == 1
+    relative = first.json()["audio_url"].removeprefix(f"{settings.media_url_path}/")
+    assert (settings.media_path / relative).exists()
+
+
+@pytest.mark.anyio
+async def test_duplicate_upload_keeps_the_file_an_existing_row_names(client):
+    body = b"ID3 recreated by a duplicate"
+    first = (await client.post("/play/upload", files={"file": ("one.mp3", body, "audio/mpeg")})).json()
+    stored = settings.media_path / first["audio_url"].removeprefix(f"{settings.media_url_path}/")
+    # as if lost, so this upload is the one that writes the file again
+    stored.unlink()
+
+    second = await client.post("/play/upload", files={"file": ("two.mp3", body, "audio/mpeg")})
+
+    assert second.status_code == 409
+    assert stored.read_bytes() == body
+    assert (await client.get(f"/play/{first['id']}/stream")).content == body
+
+
+@pytest.mark.anyio
+async def test_duplicate_upload_of_song_stored_elsewhere_leaves_no_file(client, session_factory):
+    body = b"ID3 stored under an older name"
+    legacy = settings.media_path / "legacy-name.mp3"
+    legacy.write_bytes(body)
+    async with session_factory() as session:
+        session.add(
+            Song(
+                id="legacy",
+                title="Legacy",
+                duration=1,
+                audio_url=f"{settings.media_url_path}/{legacy.name}",
+                content_hash=hashlib.sha256(body).hexdigest(),
+            )
+        )
+        await session.commit()
+
+    response = await client.post("/play/upload", files={"file": ("again.mp3", body, "audio/mpeg")})
+
+    assert response.status_code == 409
+    assert _media_contents() == [legacy]
+
+
+@pytest.mark.anyio
+async def test_bulk_upload_reports_each_file(client, session_factory):
+    existing = await client.post(
+        "/play/upload", files={"file": ("old.mp3", b"ID3 already here", "audio/mpeg")}
+    )
+    assert existing.status_code == 200
+
+    response = await client.post(
+        "/play/upload/bulk",
+        files=[
+            ("files", ("a.mp3", b"ID3 first bulk track", "audio/mpeg")),
+            ("files", ("b.mp3", b"ID3 second bulk track", "audio/mpeg")),
+            ("files", ("a-again.mp3", b"ID3 first bulk track", "audio/mpeg")),
+            ("files", ("old-again.mp3", b"ID3 already here", "audio/mpeg")),
+            ("files", ("notes.txt", b"not audio", "text/plain")),
+            ("files", ("fake.mp3", b"<html>not audio</html>", "audio/mpeg")),
+        ],
+    )
+
+    assert response.status_code == 200
+    results = {item["filename"]: item for item in response.json()}
+    assert {name: item["status"] for name, item in results.items()} == {
+        "a.mp3": "created",
+        "b.mp3": "created",
+        "a-again.mp3": "duplicate",
+        "old-again.mp3": "duplicate",
+        "notes.txt": "rejected",
+        "fake.mp3": "rejected",
+    }
+    assert results["a-again.mp3"]["song"]["id"] == results["a.mp3"]["song"]["id"]
+    assert results["old-again.mp3"]["song"]["id"] == existing.json()["id"]
+    assert results["notes.txt"]["detail"] == "Unsupported audio content type"
+    assert results["fake.mp3"]["detail"] == "File content is not a recognised audio format"
+    assert len(_media_contents()) == 3
+
+    async with session_factory() as session:
+        for name in ("a.mp3", "b.mp3"):
+            song = await Song.get_by_id(session, results[name]["song"]["id"])
+            assert song.title == Path(name).stem
+
+
+@pytest.mark.anyio
+async def test_bulk_upload_unpacks_zip_archive(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        bundle.writestr("album/01.mp3", b"ID3 archived one")
+        bundle.writestr("album/02.flac", b"fLaC archived two")
+        bundle.writestr("album/cover.jpg", b"not audio")
+        bundle.writestr("album/03.ogg", b"ID3 mislabelled track")
+
+    response = await client.post(
+        "/play/upload/bulk",
+        files={"files": ("album.zip", archive.getvalue(), "application/zip")},
+    )
+
+    assert response.status_code == 200
+    statuses = {item["filename"]: item["status"] for item in response.json()}
+    assert statuses == {
+        "01.mp3": "created",
+        "02.flac": "created",
+        "cover.jpg": "rejected",
+        "03.ogg": "rejected",
+    }
+    assert sorted(p.suffix for p in _media_contents()) == [".flac", ".mp3"]
+
+
+@pytest.mark.anyio
+async def test_media_mount_does_not_serve_upload_work_files(client):
+    created = await client.post(
+        "/play/uploads", json={"filename": "partial.mp3", "content_type": "audio/mpeg"}
+    )
+    upload_id = created.json()["id"]
+    await client.patch(
+        f"/play/uploads/{upload_id}", content=b"ID3 half a song", headers={"Upload-Offset": "0"}
+    )
+    incoming = settings.media_path / ".incoming"
+    incoming.mkdir(exist_ok=True)
+    (incoming / "in-flight.part").write_bytes(b"ID3 still arriving")
+    assert (settings.media_path / ".uploads" / f"{upload_id}.part").exists()
+
+    for name in (f".uploads/{upload_id}.part", f".uploads/{upload_id}.json", ".incoming/in-flight.part"):
+        response = await client.get(f"{settings.media_url_path}/{name}")
+        assert response.status_code == 404, name
+        assert b"ID3" not in response.content
+
+
+@pytest.mark.anyio
+async def test_failed_bulk_upload_keeps_files_that_rows_reference(
+    client, session_factory, monkeypatch: pytest.MonkeyPatch
+):
+    existing = (
+        await client.post("/play/upload", files={"file": ("old.mp3", b"ID3 already here", "audio/mpeg")})
+    ).json()
+    existing_file = settings.media_path / existing["audio_url"].removeprefix(f"{settings.media_url_path}/")
+    # lost on disk; the bulk upload below recreates it at the path the row names
+    existing_file.unlink()
+    bulk_create = Song.bulk_create
+
+    async def commit_then_fail(*args, **kwargs):
+        await bulk_create(*args, **kwargs)
+        raise RuntimeError("failed after the rows were committed")
+
+    monkeypatch.setattr(Song, "bulk_create", commit_then_fail)
+
+    with pytest.raises(RuntimeError):
+        await client.post(
+            "/play/upload/bulk",
+            files=[
+                ("files", ("new.mp3", b"ID3 a new bulk track", "audio/mpeg")),
+                ("files", ("old-again.mp3", b"ID3 already here", "audio/mpeg")),
+            ],
+        )
+
+    async with session_factory() as session:
+        songs = (await session.execute(select(Song.audio_url))).scalars().all()
+    assert len(songs) == 2
+    for audio_url in songs:
+        assert (settings.media_path / audio_url.removeprefix(f"{settings.media_url_path}/")).exists()
+
+
+@pytest.mark.anyio
+async def test_failed_bulk_upload_removes_files_it_created(client, monkeypatch: pytest.MonkeyPatch):
+    async def fail(*_args, **_kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(Song, "bulk_create", fail)
+
+    with pytest.raises(RuntimeError):
+        await client.post(
+            "/play/upload/bulk", files=[("files", ("new.mp3", b"ID3 never committed", "audio/mpeg"))]
+        )
+
+    assert _media_contents() == []
+
+
+@pytest.mark.anyio
+async def test_resumable_upload_round_trip(client):
+    body = b"ID3 resumable body " * 100
+    created = await client.post(
+        "/play/uploads",
+        json={"filename": "long.mp3", "content_type": "audio/mpeg", "length": len(body)},
+    )
+    assert created.status_code == 201
+    upload_id = created.json()["id"]
+    assert created.headers["upload-offset"] == "0"
+
+    first = await client.patch(
+        f"/play/uploads/{upload_id}",
+        content=body[:1000],
+        headers={"Upload-Offset": "0"},
+    )
+    assert first.status_code == 200
+    assert first.json()["offset"] == 1000
+
+    # a retried chunk at a stale offset is refused and told where to resume
+    stale = await client.patch(
+        f"/play/uploads/{upload_id}",
+        content=body[:1000],
+        headers={"Upload-Offset": "0"},
+    )
+    assert stale.status_code == 409
+    assert stale.headers["upload-offset"] == "1000"
+
+    early = await client.post(f"/play/uploads/{upload_id}/complete")
+    assert early.status_code == 409
+
+    status = await client.get(f"/play/uploads/{upload_id}")
+    resume_at = int(status.headers["upload-offset"])
+    rest = await client.patch(
+        f"/play/uploads/{upload_id}",
+        content=body[resume_at:],
+        headers={"Upload-Offset": str(resume_at)},
+    )
+    assert rest.json()["offset"] == len(body)
+
+    completed = await client.post(
+        f"/play/uploads/{upload_id}/complete", json={"title": "Long Track"}
+    )
+    assert completed.status_code == 200
+    song = completed.json()
+    assert song["title"] == "Long Track"
+    assert song["size_bytes"] == len(body)
+    assert song["content_hash"] == hashlib.sha256(body).hexdigest()
+    assert (await client.get(f"/play/uploads/{upload_id}")).status_code == 404
+
+    stream = await client.get(f"/play/{song['id']}/stream")
+    assert stream.content == body
+
+
+@pytest.mark.anyio
+async def test_resumable_upload_enforces_size_limit(
+    client, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_MB", 1)
+
+    declared = await client.post(
+        "/play/uploads",
+        json={"content_type": "audio/mpeg", "length": settings.max_upload_bytes + 1},
+    )
+    assert declared.status_code == 413
+
+    created = await client.post("/play/uploads", json={"content_type": "audio/mpeg"})
+    upload_id = created.json()["id"]
+    response = await client.patch(
+        f"/play/uploads/{upload_id}",
+        content=b"0" * (settings.max_upload_bytes + 1),
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 413
+
+
 @pytest.mark.anyio
 async def test_stream_song_serves_file_and_increments_playcount(
     client, session_factory
@@ -149,6 +1098,322 @@ async def test_stream_song_serves_file_and_increments_playcount(
         expected_mime or "application/octet-stream"
     )
 
+    await playcount_aggregator.flush()
     async with session_factory() as session:
         playcount = await PlayCount.get_by_id(session, song_id)
         assert playcount.count == 1
+
+
+async def _seed_streamable_song(session_factory, song_id: str, payload: bytes) -> Path:
+    media_file = settings.media_path / f"{song_id}.mp3"
+    media_file.write_bytes(payload)
+
+    async with session_factory() as session:
+        session.add(
+            Song(
+                id=song_id,
+                title=song_id,
+                description=None,
+                duration=1,
+                audio_url=f"{settings.media_url_path}/{media_file.name}",
+            )
+        )
+        await session.commit()
+    return media_file
+
+
+async def _call_app(path: str, extensions: dict, headers: dict[str, str] | None = None) -> list[dict]:
+    """Drive the full app with a hand-built scope, as a server offering ``extensions`` would."""
+
+    raw_headers = [(b"host", b"testserver"), (API_KEY_HEADER_NAME.lower().encode(), settings.API_KEY.encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+        "extensions": extensions,
+    }
+    messages: list[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    await fastapi_app(scope, receive, send)
+    return messages
+
+
+@pytest.mark.anyio
+async def test_stream_song_uses_zerocopy_through_the_app(client, session_factory):
+    await _seed_streamable_song(session_factory, "zerocopy", b"0123456789")
+    latency_before = REGISTRY.get_sample_value(
+        "mosic_request_latency_seconds_count", {"method": "GET", "path": "/play/{song_id}/stream"}
+    ) or 0.0
+
+    messages = await _call_app(
+        "/play/zerocopy/stream", {"http.response.zerocopy": {}}, {"Range": "bytes=2-5"}
+    )
+
+    assert messages[0]["type"] == "http.response.start"
+    assert messages[0]["status"] == 206
+    zerocopy = [m for m in messages if m["type"] == "http.response.zerocopy"]
+    assert [(m["offset"], m["count"]) for m in zerocopy] == [(2, 4)]
+    assert REGISTRY.get_sample_value(
+        "mosic_request_latency_seconds_count", {"method": "GET", "path": "/play/{song_id}/stream"}
+    ) == latency_before + 1
+
+
+def _stage_count(route: str, stage: str, outcome: str = "ok") -> float:
+    value = REGISTRY.get_sample_value(
+        "mosic_pipeline_stage_seconds_count",
+        {"route": route, "stage": stage, "outcome": outcome},
+    )
+    return value or 0.0
+
+
+@pytest.mark.anyio
+async def test_stream_song_records_stage_metrics(client, session_factory):
+    payload = b"0123456789" * 10
+    await _seed_streamable_song(session_factory, "timed", payload)
+    route = "/play/{song_id}/stream"
+    stages = ("db_lookup", "file_stat", "playcount", "file_open", "first_byte", "complete")
+    before = {stage: _stage_count(route, stage) for stage in stages}
+    bytes_before = REGISTRY.get_sample_value(
+        "mosic_stream_response_bytes_sum", {"route": route, "outcome": "ok"}
+    ) or 0.0
+
+    response = await client.get("/play/timed/stream", headers={"Range": "bytes=0-9"})
+
+    assert response.status_code == 206
+    for stage in stages:
+        assert _stage_count(route, stage) == before[stage] + 1, stage
+    assert REGISTRY.get_sample_value(
+        "mosic_stream_response_bytes_sum", {"route": route, "outcome": "ok"}
+    ) == bytes_before + 10
+
+
+@pytest.mark.anyio
+async def test_upload_records_stage_metrics(client):
+    route = "/play/upload"
+    stages = ("store", "metadata", "db_insert")
+    before = {stage: _stage_count(route, stage) for stage in stages}
+
+    response = await client.post(
+        "/play/upload", files={"file": ("timed.mp3", b"ID3 timed upload", "audio/mpeg")}
+    )
+
+    assert response.status_code == 200
+    for stage in stages:
+        assert _stage_count(route, stage) == before[stage] + 1, stage
+
+
+@pytest.mark.anyio
+async def test_stream_song_serves_single_range(client, session_factory):
+    payload = bytes(range(256)) * 4
+    await _seed_streamable_song(session_factory, "ranged", payload)
+
+    response = await client.get("/play/ranged/stream", headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.content == payload[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(payload)}"
+    assert response.headers["content-length"] == "100"
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.anyio
+async def test_stream_song_serves_multiple_ranges(client, session_factory):
+    payload = bytes(range(256)) * 4
+    await _seed_streamable_song(session_factory, "multi", payload)
+
+    response = await client.get("/play/multi/stream", headers={"Range": "bytes=0-9, -10"})
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=", 1)[1].encode()
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert response.content.endswith(b"--" + boundary + b"--\r\n")
+    assert f"Content-Range: bytes 0-9/{len(payload)}".encode() in response.content
+    assert payload[:10] in response.content
+    assert payload[-10:] in response.content
+
+
+@pytest.mark.anyio
+async def test_stream_song_serves_ranges_from_media_cache(
+    client, session_factory, monkeypatch
+):
+    cache = MediaCache(max_bytes=1024 * 1024, max_file_bytes=1024 * 1024, min_hits=1)
+    monkeypatch.setattr(play_router, "media_cache", cache)
+    payload = bytes(range(256)) * 4
+    await _seed_streamable_song(session_factory, "cached", payload)
+
+    full = await client.get("/play/cached/stream")
+    assert full.content == payload
+    assert cache.resident_bytes == len(payload)
+
+    ranged = await client.get("/play/cached/stream", headers={"Range": "bytes=100-199, -10"})
+    assert ranged.status_code == 206
+    assert payload[100:200] in ranged.content
+    assert payload[-10:] in ranged.content
+
+
+@pytest.mark.anyio
+async def test_stream_song_rejects_unsatisfiable_range(client, session_factory):
+    payload = b"0123456789"
+    await _seed_streamable_song(session_factory, "short", payload)
+
+    response = await client.get("/play/short/stream", headers={"Range": "bytes=50-60"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */10"
+
+    await playcount_aggregator.flush()
+    async with session_factory() as session:
+        playcount = await PlayCount.get_by_id(session, "short")
+        assert playcount.count == 0
+
+
+@pytest.mark.anyio
+async def test_stream_song_ignores_range_when_if_range_is_stale(client, session_factory):
+    payload = b"0123456789"
+    await _seed_streamable_song(session_factory, "stale", payload)
+
+    response = await client.get(
+        "/play/stale/stream",
+        headers={"Range": "bytes=0-1", "If-Range": '"outdated"'},
+    )
+
+    assert response.status_code == 200
+    assert response.content == payload
+
+
+@pytest.mark.anyio
+async def test_repeated_streams_are_flushed_as_one_increment(client, session_factory):
+    await _seed_streamable_song(session_factory, "popular", b"data")
+
+    for listener in ("a", "b", "c"):
+        response = await client.get("/play/popular/stream", headers={"X-Client-Id": listener})
+        assert response.status_code == 200
+
+    assert playcount_aggregator.pending == 3
+    async with session_factory() as session:
+        assert (await PlayCount.get_by_id(session, "popular")).count == 0
+
+    await playcount_aggregator.flush()
+
+    assert playcount_aggregator.pending == 0
+    async with session_factory() as session:
+        assert (await PlayCount.get_by_id(session, "popular")).count == 3
+
+
+@pytest.mark.anyio
+async def test_repeat_plays_by_one_listener_are_counted_once(client, session_factory):
+    await _seed_streamable_song(session_factory, "seeky", bytes(range(200)))
+    suppressed = REGISTRY.get_sample_value("mosic_plays_suppressed_total") or 0.0
+
+    # a play, a seek and a retry from the same listener
+    await client.get("/play/seeky/stream")
+    await client.get("/play/seeky/stream", headers={"Range": "bytes=100-"})
+    await client.get("/play/seeky/stream")
+    # the same address with a different client id is another listener
+    await client.get("/play/seeky/stream", headers={"X-Client-Id": "other-tab"})
+
+    assert playcount_aggregator.pending == 2
+    assert REGISTRY.get_sample_value("mosic_plays_suppressed_total") == suppressed + 2
+
+
+@pytest.mark.anyio
+async def test_stream_song_serves_metadata_from_cache(
+    client, session_factory, test_engine, monkeypatch: pytest.MonkeyPatch
+):
+    await _seed_streamable_song(session_factory, "cached", b"data")
+    assert (await client.get("/play/cached/stream")).status_code == 200
+
+    async def unavailable(*_args, **_kwargs):
+        raise AssertionError("cache miss went to the database")
+
+    monkeypatch.setattr(Song, "get_by_id", unavailable)
+
+    with _recorded_statements(test_engine) as statements:
+        response = await client.get("/play/cached/stream")
+
+    assert response.status_code == 200
+    assert response.content == b"data"
+    assert statements == []
+
+
+@pytest.mark.anyio
+async def test_unknown_song_is_negatively_cached_until_created(client, session_factory):
+    response = await client.get("/play/late-arrival/stream")
+    assert response.status_code == 404
+    assert song_cache.get("late-arrival") == (True, None)
+
+    await _seed_streamable_song(session_factory, "late-arrival", b"data")
+
+    assert song_cache.get("late-arrival") == (False, None)
+    response = await client.get("/play/late-arrival/stream")
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_stream_song_releases_connection_before_body(
+    client, session_factory, test_engine
+):
+    await _seed_streamable_song(session_factory, "long-listen", b"x" * 4096)
+
+    checked_out = 0
+
+    def on_checkout(*_args) -> None:
+        nonlocal checked_out
+        checked_out += 1
+
+    def on_checkin(*_args) -> None:
+        nonlocal checked_out
+        checked_out -= 1
+
+    event.listen(test_engine.sync_engine.pool, "checkout", on_checkout)
+    event.listen(test_engine.sync_engine.pool, "checkin", on_checkin)
+
+    observed: list[tuple[str, int]] = []
+
+    async def receive() -> dict:  # pragma: no cover - body is never read
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        observed.append((message["type"], checked_out))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/play/long-listen/stream",
+        "raw_path": b"/play/long-listen/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+    }
+    try:
+        await fastapi_app(scope, receive, send)
+    finally:
+        event.remove(test_engine.sync_engine.pool, "checkout", on_checkout)
+        event.remove(test_engine.sync_engine.pool, "checkin", on_checkin)
+
+    body_messages = [count for kind, count in observed if kind.startswith("http.response")]
+    assert body_messages, observed
+    assert all(count == 0 for count in body_messages), observed